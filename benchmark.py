@@ -0,0 +1,167 @@
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from fleet import Fleet
+from graph import furthest_pair
+import map_format
+import map_loader
+import mapgen
+from routing import Router
+from scheduler import EventFleet
+from spatial import SpatialGrid, close_pairs, group_pairs
+
+SIZES = [1000, 10000, 100000, 1000000]
+VIEWPORT = (800, 600)
+OVERLAP_RADIUS = 10
+
+
+def measure(function, repeats=1):
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+class Benchmark:
+    def __init__(self, output, queries=10, vehicles=1000, max_json_nodes=None, pieces=1):
+        self.output = output
+        self.queries = queries
+        self.vehicles = vehicles
+        self.max_json_nodes = max_json_nodes
+        self.pieces = pieces
+        self.results = []
+
+    def record(self, kind, graph, stage, seconds, repeats=1):
+        self.results.append({"kind": kind, "nodes": graph.node_count, "edges": graph.edge_count,
+                             "stage": stage, "seconds": seconds, "repeats": repeats})
+        print(f"{kind:>10} {graph.node_count:>8} nodes  {stage:<22} {seconds * 1000:10.2f} ms")
+
+    def run_size(self, kind, nodes, directory):
+        started = time.perf_counter()
+        graph = mapgen.subdivide(mapgen.generate(kind, nodes, dashed_ratio=0.2), self.pieces)
+        self.record(kind, graph, "generate", time.perf_counter() - started)
+
+        self.bench_loading(kind, graph, directory)
+        self.bench_diameter(kind, graph)
+        self.bench_routing(kind, graph, directory)
+        self.bench_frame(kind, graph)
+        self.bench_cleanup(kind, graph)
+
+    def bench_loading(self, kind, graph, directory):
+        binary_path = os.path.join(directory, f"{kind}_{graph.node_count}.smap")
+        self.record(kind, graph, "save_binary", measure(lambda: map_format.save_binary(graph, binary_path)))
+        self.record(kind, graph, "load_binary", measure(lambda: map_loader.load_map(binary_path), 3), 3)
+
+        if self.max_json_nodes is None or graph.node_count <= self.max_json_nodes:
+            json_path = os.path.join(directory, f"{kind}_{graph.node_count}.json")
+            self.record(kind, graph, "save_json", measure(lambda: map_format.save_json(graph, json_path)))
+            self.record(kind, graph, "load_json", measure(lambda: map_loader.load_map(json_path)))
+
+    def bench_diameter(self, kind, graph):
+        self.record(kind, graph, "diameter_geometric", measure(lambda: furthest_pair(graph.xs, graph.ys)))
+        self.record(kind, graph, "diameter_graph", measure(lambda: graph.furthest_pair(graph_distance=True)))
+
+    def bench_routing(self, kind, graph, directory):
+        rng = random.Random(0)
+        pairs = [(rng.randrange(graph.node_count), rng.randrange(graph.node_count)) for _ in range(self.queries)]
+        graph._adjacency_lists()
+
+        def run(search):
+            for start, end in pairs:
+                search(start, end)
+
+        per_query = self.queries or 1
+        self.record(kind, graph, "route_dijkstra", measure(lambda: run(graph.shortest_path)) / per_query)
+        self.record(kind, graph, "route_astar", measure(lambda: run(graph.astar)) / per_query)
+
+        map_path = os.path.join(directory, f"{kind}_{graph.node_count}.smap")
+        started = time.perf_counter()
+        router = Router(graph, map_path, landmark_count=8)
+        self.record(kind, graph, "alt_preprocess", time.perf_counter() - started)
+        router.landmarks._landmark_rows()
+        self.record(kind, graph, "route_alt", measure(lambda: run(router.route)) / per_query)
+        self.record(kind, graph, "route_cached", measure(lambda: run(router.route), 5) / per_query, 5)
+
+        started = time.perf_counter()
+        contracted = Router(graph, contract=True).contracted
+        self.record(kind, graph, "contract", time.perf_counter() - started)
+        self.record(kind, graph, "route_contracted", measure(lambda: run(contracted.route)) / per_query)
+
+    def bench_frame(self, kind, graph):
+        started = time.perf_counter()
+        spatial_index = SpatialGrid.from_graph(graph, points=False)
+        self.record(kind, graph, "spatial_index", time.perf_counter() - started)
+
+        # What on_draw does on the CPU each frame: pick the visible cells for
+        # the viewport and move and read back the vehicles.
+        rng = np.random.default_rng(0)
+        fleet = Fleet(graph.xs, graph.ys)
+        routes = [rng.integers(0, graph.node_count, 20) for _ in range(self.vehicles)]
+        fleet.add_agents(routes, 100.0)
+        center_x, center_y = float(np.median(graph.xs)), float(np.median(graph.ys))
+        half_width, half_height = VIEWPORT[0] / 2, VIEWPORT[1] / 2
+
+        def frame():
+            list(spatial_index.cells_in_rect(center_x - half_width, center_y - half_height,
+                                             center_x + half_width, center_y + half_height))
+            fleet.update(1 / 60.0)
+            fleet.positions()
+
+        self.record(kind, graph, "frame_cpu", measure(frame, 60), 60)
+
+        # The same fleet on the event-driven core, which only pays for node
+        # arrivals.
+        events = EventFleet(graph.xs, graph.ys)
+        events.add_agents(routes, 100.0)
+
+        def event_frame():
+            events.update(1 / 60.0)
+            events.positions()
+
+        self.record(kind, graph, "frame_cpu_events", measure(event_frame, 60), 60)
+
+    def bench_cleanup(self, kind, graph):
+        xs, ys = graph.xs.tolist(), graph.ys.tolist()
+        started = time.perf_counter()
+        pairs = close_pairs(xs, ys, OVERLAP_RADIUS)
+        group_pairs(len(xs), pairs)
+        self.record(kind, graph, "overlap_cleanup", time.perf_counter() - started)
+
+    def save(self):
+        data = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "results": self.results,
+        }
+        with open(self.output, "w") as output_file:
+            json.dump(data, output_file, indent=4)
+        print(f"Results written to {self.output}")
+
+
+if __name__ == "__main__":
+    options = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--") and "=" in arg)
+    sizes = [int(size) for size in options["sizes"].split(",")] if "sizes" in options else SIZES
+    kinds = options.get("kinds", "grid,geometric").split(",")
+    pieces = int(options.get("subdivide", 1))
+    max_json_nodes = int(options["max-json-nodes"]) if "max-json-nodes" in options else None
+
+    benchmark = Benchmark(options.get("output", "benchmark_results.json"), queries=int(options.get("queries", 10)),
+                          vehicles=int(options.get("vehicles", 1000)), max_json_nodes=max_json_nodes, pieces=pieces)
+    with tempfile.TemporaryDirectory() as directory:
+        for kind in kinds:
+            for nodes in sizes:
+                benchmark.run_size(kind, nodes, directory)
+    benchmark.save()
@@ -0,0 +1,170 @@
+import heapq
+import math
+
+import numpy as np
+
+from graph import Graph
+
+
+class ContractedGraph:
+    # Chains of nodes that only continue a street (two distinct neighbours,
+    # both connections solid or both dashed) are collapsed into one edge
+    # between the intersections at their ends. The edge weighs the whole
+    # chain and remembers its nodes, so searches run on intersections only
+    # and paths are expanded back to every traced node.
+    def __init__(self, graph):
+        self.original = graph
+        indptr, indices, _, xs, ys = graph._adjacency_lists()
+        adjacency_edges = graph.adjacency_edges.tolist()
+        weights = graph.edge_length.tolist()
+        dashed = graph.edge_dashed.tolist()
+
+        kept = [True] * graph.node_count
+        for node in range(graph.node_count):
+            if indptr[node + 1] - indptr[node] != 2:
+                continue
+            first, second = indptr[node], indptr[node] + 1
+            kept[node] = (indices[first] == indices[second] or node in (indices[first], indices[second]) or
+                          dashed[adjacency_edges[first]] != dashed[adjacency_edges[second]])
+
+        # chain_nodes[chain_start[e]:chain_start[e + 1]] are the original
+        # nodes of contracted edge e, from its start to its end.
+        chain_nodes, chain_start = [], [0]
+        edge_start, edge_end, edge_length, edge_dashed = [], [], [], []
+        visited = [False] * graph.edge_count
+        # Chain position of every node left out: its edge, its index in the
+        # chain and its distance from the chain start.
+        self.node_edge = {}
+
+        def walk(node, k):
+            nodes, length = [node], 0.0
+            while True:
+                edge = adjacency_edges[k]
+                visited[edge] = True
+                length += weights[edge]
+                node = indices[k]
+                nodes.append(node)
+                if kept[node]:
+                    break
+                self.node_edge[node] = (len(edge_start), len(nodes) - 1, length)
+                first = indptr[node]
+                k = first if adjacency_edges[first] != edge else first + 1
+            edge_start.append(nodes[0])
+            edge_end.append(nodes[-1])
+            edge_length.append(length)
+            edge_dashed.append(dashed[adjacency_edges[k]])
+            chain_nodes.extend(nodes)
+            chain_start.append(len(chain_nodes))
+
+        for node in range(graph.node_count):
+            if kept[node]:
+                for k in range(indptr[node], indptr[node + 1]):
+                    if not visited[adjacency_edges[k]]:
+                        walk(node, k)
+        # What is left are loops made only of chain nodes; one node of each
+        # is kept so the loop becomes an edge from it back to itself.
+        for k in range(len(indices)):
+            if not visited[adjacency_edges[k]]:
+                node = graph.edge_start[adjacency_edges[k]]
+                kept[node] = True
+                walk(node, k)
+
+        self.kept_nodes = np.flatnonzero(kept)
+        self.contracted_id = np.full(graph.node_count, -1, dtype=np.int64)
+        self.contracted_id[self.kept_nodes] = np.arange(len(self.kept_nodes))
+        contracted_id = self.contracted_id.tolist()
+        self.graph = Graph(graph.xs[self.kept_nodes], graph.ys[self.kept_nodes],
+                           [contracted_id[node] for node in edge_start], [contracted_id[node] for node in edge_end],
+                           edge_dashed, edge_length)
+        self.chain_nodes = chain_nodes
+        self.chain_start = chain_start
+        self.edge_start = edge_start
+        self.edge_length = edge_length
+        self.adjacency_edges = self.graph.adjacency_edges.tolist()
+        self.xs, self.ys = xs, ys
+        self.kept_list = self.kept_nodes.tolist()
+        self.contracted_list = contracted_id
+
+    def _chain(self, edge, from_node):
+        nodes = self.chain_nodes[self.chain_start[edge]:self.chain_start[edge + 1]]
+        return nodes if self.edge_start[edge] == from_node else nodes[::-1]
+
+    def _ends(self, node):
+        # The contracted nodes a node is reached through, each with the
+        # distance to it and the original nodes walked from it to the node.
+        if self.contracted_list[node] >= 0:
+            return [(self.contracted_list[node], 0.0, [node])]
+        edge, index, distance = self.node_edge[node]
+        nodes = self.chain_nodes[self.chain_start[edge]:self.chain_start[edge + 1]]
+        length = self.edge_length[edge]
+        return [(self.contracted_list[nodes[0]], distance, nodes[:index + 1]),
+                (self.contracted_list[nodes[-1]], length - distance, nodes[:index - 1:-1])]
+
+    def route(self, start, end):
+        if start == end:
+            return [start]
+        indptr, indices, weights, _, _ = self.graph._adjacency_lists()
+        adjacency_edges = self.adjacency_edges
+        kept, xs, ys = self.kept_list, self.xs, self.ys
+        end_x, end_y = xs[end], ys[end]
+
+        best, best_path = math.inf, []
+        # Both nodes inside the same chain may be joined along it directly.
+        if start in self.node_edge and end in self.node_edge and self.node_edge[start][0] == self.node_edge[end][0]:
+            edge, start_index, start_distance = self.node_edge[start]
+            _, end_index, end_distance = self.node_edge[end]
+            nodes = self.chain_nodes[self.chain_start[edge]:self.chain_start[edge + 1]]
+            step = 1 if end_index > start_index else -1
+            best, best_path = abs(end_distance - start_distance), nodes[start_index:end_index + step:step]
+
+        targets = {}
+        for node, distance, nodes in self._ends(end):
+            if distance < targets.get(node, (math.inf,))[0]:
+                targets[node] = (distance, nodes)
+
+        # A* over intersections, seeded with both chain ends of the start.
+        # The straight line to the end never overestimates, chains included.
+        distances, previous, prefixes, unvisited = {}, {}, {}, []
+        for node, distance, nodes in self._ends(start):
+            if distance < distances.get(node, math.inf):
+                distances[node] = distance
+                previous[node] = None
+                prefixes[node] = nodes[::-1]
+                original = kept[node]
+                heapq.heappush(unvisited, (distance + math.hypot(xs[original] - end_x, ys[original] - end_y),
+                                           -distance, node))
+
+        found = None
+        while unvisited:
+            estimate, current_distance, current_id = heapq.heappop(unvisited)
+            current_distance = -current_distance
+            if estimate >= best:
+                break
+            if current_distance > distances[current_id]:
+                continue
+            if current_id in targets and current_distance + targets[current_id][0] < best:
+                best, found = current_distance + targets[current_id][0], current_id
+
+            for k in range(indptr[current_id], indptr[current_id + 1]):
+                neighbor_id = indices[k]
+                distance = current_distance + weights[k]
+                if distance < distances.get(neighbor_id, math.inf):
+                    distances[neighbor_id] = distance
+                    previous[neighbor_id] = (current_id, adjacency_edges[k])
+                    original = kept[neighbor_id]
+                    heapq.heappush(unvisited, (distance + math.hypot(xs[original] - end_x, ys[original] - end_y),
+                                               -distance, neighbor_id))
+
+        if found is None:
+            return best_path
+
+        pieces = [targets[found][1]]
+        node = found
+        while previous[node] is not None:
+            before, edge = previous[node]
+            pieces.append(self._chain(edge, kept[before]))
+            node = before
+        path = list(prefixes[node])
+        for piece in reversed(pieces):
+            path.extend(piece[1:])
+        return path
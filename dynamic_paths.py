@@ -0,0 +1,99 @@
+import heapq
+import itertools
+import math
+
+
+class DynamicShortestPaths:
+    # Shortest path tree from one source that is repaired in place when
+    # edges come and go, instead of being searched again from scratch.
+    # neighbours(node) yields (other_node, length) for the current graph.
+    def __init__(self, source, neighbours):
+        self.source = source
+        self.neighbours = neighbours
+        self.distances = {source: 0.0}
+        self.parents = {source: None}
+        self.children = {source: set()}
+        self.counter = itertools.count()
+        self._relax([(0.0, next(self.counter), source)])
+
+    def distance(self, node):
+        return self.distances.get(node, math.inf)
+
+    def path_to(self, target):
+        if target not in self.distances:
+            return []
+        path = [target]
+        while path[-1] != self.source:
+            path.append(self.parents[path[-1]])
+        return path[::-1]
+
+    def _set_parent(self, node, parent):
+        old_parent = self.parents.get(node)
+        if old_parent is not None:
+            self.children[old_parent].discard(node)
+        self.parents[node] = parent
+        self.children.setdefault(node, set())
+        if parent is not None:
+            self.children[parent].add(node)
+
+    def _relax(self, heap):
+        heapq.heapify(heap)
+        while heap:
+            current_distance, _, current = heapq.heappop(heap)
+            if current_distance > self.distances.get(current, math.inf):
+                continue
+            for neighbour, length in self.neighbours(current):
+                distance = current_distance + length
+                if distance < self.distances.get(neighbour, math.inf):
+                    self.distances[neighbour] = distance
+                    self._set_parent(neighbour, current)
+                    heapq.heappush(heap, (distance, next(self.counter), neighbour))
+
+    def edge_added(self, a, b, length):
+        # A new edge can only shorten paths, and only starting from its
+        # endpoints, so relaxing from the far end reaches every improvement.
+        for near, far in ((a, b), (b, a)):
+            distance = self.distances.get(near, math.inf) + length
+            if distance < self.distances.get(far, math.inf):
+                self.distances[far] = distance
+                self._set_parent(far, near)
+                self._relax([(distance, next(self.counter), far)])
+
+    def edge_removed(self, a, b):
+        # Removing an edge outside the tree changes nothing. Otherwise only
+        # the subtree hanging below it lost its path: it is cut off and
+        # reconnected from the nodes around it that kept theirs.
+        if self.parents.get(b) == a:
+            root = b
+        elif self.parents.get(a) == b:
+            root = a
+        else:
+            return
+
+        affected = [root]
+        for node in affected:
+            affected.extend(self.children[node])
+        affected_set = set(affected)
+        for node in affected:
+            self._set_parent(node, None)
+            del self.distances[node]
+
+        heap = []
+        for node in affected:
+            best, best_parent = math.inf, None
+            for neighbour, length in self.neighbours(node):
+                if neighbour in affected_set:
+                    continue
+                distance = self.distances.get(neighbour, math.inf) + length
+                if distance < best:
+                    best, best_parent = distance, neighbour
+            if best_parent is not None:
+                self.distances[node] = best
+                self._set_parent(node, best_parent)
+                heap.append((best, next(self.counter), node))
+        self._relax(heap)
+
+        for node in affected:
+            if node not in self.distances:
+                del self.parents[node]
+                del self.children[node]
@@ -1,9 +1,19 @@
 import json
-from PyQt6.QtWidgets import QApplication, QGraphicsView, QGraphicsScene, QGraphicsEllipseItem, QGraphicsLineItem, QGraphicsRectItem, QGraphicsPolygonItem
-from PyQt6.QtGui import QPen, QBrush, QPolygonF
-from PyQt6.QtCore import Qt, QPointF
+import math
+from PyQt6.QtWidgets import QApplication, QGraphicsView, QGraphicsScene, QGraphicsEllipseItem, QGraphicsRectItem, QGraphicsPathItem
+from PyQt6.QtGui import QPen, QBrush, QPolygonF, QPainterPath
+from PyQt6.QtCore import Qt, QPointF, QLineF, QTimer
 import sys
 from PyQt6.QtGui import QPainter, QPen, QFont
+from spatial import SpatialGrid, close_pairs, group_pairs
+from graph import Graph
+from map_format import is_binary_path, save_binary
+import map_loader
+from journal import EditJournal
+from instrumentation import Profiler
+from map_item import MapItem, TileItem
+from tiles import TilePyramid
+from dynamic_paths import DynamicShortestPaths
 
 class Point:
     def __init__(self, x, y):
@@ -22,6 +32,15 @@ class Point:
             self.connected_points_normal.append(other_point)
             self.direction_normal.append(direction)
 
+    def remove_connection(self, other_point, is_dashed):
+        if is_dashed:
+            points, directions = self.connected_points_dashed, self.direction_dashed
+        else:
+            points, directions = self.connected_points_normal, self.direction_normal
+        index = points.index(other_point)
+        del points[index]
+        del directions[index]
+
     def to_dict(self):
         connections_normal = [{"x": p.x, "y": p.y, "direction": dir} for p, dir in zip(self.connected_points_normal, self.direction_normal)]
         connections_dashed = [{"x": p.x, "y": p.y, "direction": dir} for p, dir in zip(self.connected_points_dashed, self.direction_dashed)]
@@ -35,18 +54,29 @@ class Point:
 from PyQt6.QtGui import QPixmap, QBrush
 
 class MapEditor(QGraphicsView):
-    def __init__(self):
+    def __init__(self, map_path="points_data.json", profile=False, trace_path=None):
         super().__init__()
         self.scene = QGraphicsScene()
         self.setScene(self.scene)
         self.setRenderHint(self.renderHints())
         self.setDragMode(QGraphicsView.DragMode.NoDrag)
         
+        self.map_path = map_path
+        self.profiler = Profiler(enabled=profile or trace_path is not None)
+        self.trace_path = trace_path
         self.points = []
+        self.point_ids = {}
+        self.connections = {}
+        self.spatial_index = SpatialGrid()
         self.selected_point = None
+        self.hovered_point = None
         self.scale_factor = 1.2
         self.move_step = 20
         self.dashed_line = False
+        self.point_radius = 5
+        self.snap_radius = 10
+        self.snap_to_points = False
+        self.overlap_radius = 10
         
         self.load_background_image("photo.png")
         
@@ -54,8 +84,46 @@ class MapEditor(QGraphicsView):
         self.origin_square.setBrush(QBrush(Qt.GlobalColor.red))
         self.origin_square.setPen(QPen(Qt.GlobalColor.black))
         self.scene.addItem(self.origin_square)
+        
+        # The map is painted by a single item; only the selected and the
+        # hovered point get items of their own.
+        self.map_item = MapItem(self)
+        self.scene.addItem(self.map_item)
+        self.viewport().setMouseTracking(True)
+        
+        # Live route preview between two points chosen with R. The shortest
+        # path tree from the start is repaired after every edit instead of
+        # being searched again.
+        self.route_start = None
+        self.route_end = None
+        self.route_marker = None
+        self.route_tree = None
+        self.route_refresh_pending = False
+        self.route_item = QGraphicsPathItem()
+        self.route_item.setPen(QPen(Qt.GlobalColor.green, 4))
+        self.route_item.setZValue(-0.5)
+        self.scene.addItem(self.route_item)
+        
+        # Edits are appended to a journal next to the map, so the map on disk
+        # plus the journal always matches what the editor shows.
+        self.journal = EditJournal(self.map_path)
+        self.autosave_interval = 5000
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.timeout.connect(self.autosave)
+        self.autosave_timer.start(self.autosave_interval)
+        self.load_map()
     
     def load_background_image(self, image_path):
+        # A tile pyramid cut by tiles.py is preferred, so large photos are
+        # never loaded whole.
+        pyramid = TilePyramid.for_image(image_path)
+        if pyramid is not None:
+            self.background_item = TileItem(pyramid)
+            self.background_item.setZValue(-1)
+            self.scene.addItem(self.background_item)
+            print(f"Wczytano kafelki tła: {pyramid.directory}")
+            return
+        
         try:
             pixmap = QPixmap(image_path)
             if pixmap.isNull():
@@ -79,54 +147,115 @@ class MapEditor(QGraphicsView):
             self.add_point(event.position())
         elif event.button() == Qt.MouseButton.RightButton:
             self.select_or_connect(event.position())
+    
+    def mouseMoveEvent(self, event):
+        super().mouseMoveEvent(event)
+        point = self.find_point(self.mapToScene(event.position().toPoint()), self.point_radius)
+        if self.hovered_point is not None and self.hovered_point[1] is point:
+            return
+        if self.hovered_point is not None:
+            self.scene.removeItem(self.hovered_point[0])
+            self.hovered_point = None
+        if point is not None:
+            self.hovered_point = (self.highlight_point(point, Qt.GlobalColor.darkGray), point)
+    
+    def highlight_point(self, point, color):
+        item = QGraphicsEllipseItem(point.x - 7, point.y - 7, 14, 14)
+        item.setPen(QPen(color, 2))
+        item.setZValue(1)
+        self.scene.addItem(item)
+        return item
         
     def add_point(self, pos):
         scene_pos = self.mapToScene(pos.toPoint())
-        point_item = QGraphicsEllipseItem(scene_pos.x() - 5, scene_pos.y() - 5, 10, 10)
-        point_item.setBrush(QBrush(Qt.GlobalColor.blue))
-        point_item.setPen(QPen(Qt.GlobalColor.black))
-        point_item.setFlag(QGraphicsEllipseItem.GraphicsItemFlag.ItemIsSelectable)
-        self.scene.addItem(point_item)
-
-        point = Point(scene_pos.x(), scene_pos.y())
-        self.points.append((point_item, point))
+        if self.snap_to_points:
+            # A click close to an existing point means that point, so it is
+            # used for a connection instead of placing a new one on top.
+            point = self.find_point(scene_pos, self.snap_radius)
+            if point is not None:
+                self.choose_point(point)
+                return
+        
+        self.create_point(scene_pos.x(), scene_pos.y())
+        self.journal.record_add(scene_pos.x(), scene_pos.y())
+    
+    def create_point(self, x, y):
+        point = Point(x, y)
+        self.point_ids[point] = len(self.points)
+        self.points.append(point)
+        self.spatial_index.insert_point(point, x, y)
+        self.map_item.include(x, y)
+        self.map_item.update()
+        return point
+    
+    def find_point(self, scene_pos, radius):
+        return self.spatial_index.nearest_point(scene_pos.x(), scene_pos.y(), radius)
         
     def select_or_connect(self, pos):
         scene_pos = self.mapToScene(pos.toPoint())
-        for point_item, point in self.points:
-            if point_item.contains(scene_pos):
-                if self.selected_point is None:
-                    self.selected_point = (point_item, point)
-                else:
-                    self.connect_points(self.selected_point[1], point, self.dashed_line)
-                    self.selected_point = None
-                break
-        
-    def connect_points(self, p1, p2, is_dashed):
-        x1, y1 = p1.x, p1.y
-        x2, y2 = p2.x, p2.y
+        point = self.find_point(scene_pos, self.point_radius)
+        if point is not None:
+            self.choose_point(point)
+    
+    def choose_point(self, point):
+        if self.selected_point is None:
+            self.selected_point = (self.highlight_point(point, Qt.GlobalColor.red), point)
+        else:
+            self.connect_points(self.selected_point[1], point, self.dashed_line)
+            self.scene.removeItem(self.selected_point[0])
+            self.selected_point = None
         
-        line = QGraphicsLineItem(x1, y1, x2, y2)
-        pen = QPen(Qt.GlobalColor.black, 2)
+    def has_connection(self, p1, p2):
+        # Two points are joined at most once, solid or dashed, the same rule
+        # map_loader applies when it reads a map.
+        return any((a, b, is_dashed) in self.connections
+                   for a, b in ((p1, p2), (p2, p1)) for is_dashed in (False, True))
         
-        if is_dashed:
-            pen.setStyle(Qt.PenStyle.DashLine)
-        line.setPen(pen)
+    def connect_points(self, p1, p2, is_dashed, record=True):
+        # A point connected to itself has no direction and could not be
+        # disconnected cleanly, so it is refused like a duplicate.
+        if p1 is p2 or self.has_connection(p1, p2):
+            return
+        if record:
+            self.journal.record_connect(self.point_ids[p1], self.point_ids[p2], is_dashed)
         
-        self.scene.addItem(line)
+        x1, y1 = p1.x, p1.y
+        x2, y2 = p2.x, p2.y
         
-        self.add_arrow(x1, y1, x2, y2)
+        self.connections[(p1, p2, is_dashed)] = (QLineF(x1, y1, x2, y2), self.add_arrow(x1, y1, x2, y2))
+        self.map_item.update()
 
         direction = (x2 - x1, y2 - y1)
         p1.add_connection(p2, is_dashed, direction)
         p2.add_connection(p1, is_dashed, (-direction[0], -direction[1]))
+        self.spatial_index.insert_edge((p1, p2, is_dashed), x1, y1, x2, y2)
+        
+        if self.route_tree is not None:
+            self.route_tree.edge_added(p1, p2, math.hypot(x2 - x1, y2 - y1))
+            self.schedule_route_refresh()
+
+    def disconnect_points(self, p1, p2, is_dashed):
+        key = (p1, p2, is_dashed)
+        if key not in self.connections:
+            key = (p2, p1, is_dashed)
+        del self.connections[key]
+        self.spatial_index.remove_edge(key)
+        self.map_item.update()
+        
+        p1.remove_connection(p2, is_dashed)
+        if p1 is not p2:
+            p2.remove_connection(p1, is_dashed)
+        
+        if self.route_tree is not None:
+            self.route_tree.edge_removed(p1, p2)
+            self.schedule_route_refresh()
 
     def add_arrow(self, x1, y1, x2, y2):
         arrow_size = 10
         dx, dy = x2 - x1, y2 - y1
         length = (dx**2 + dy**2) ** 0.5
         if length == 0:
-            return
+            return None
         
         mid_x, mid_y = (x1 + x2) / 2, (y1 + y2) / 2
         unit_dx, unit_dy = dx / length, dy / length
@@ -135,10 +264,7 @@ class MapEditor(QGraphicsView):
         arrow_p2 = QPointF(mid_x - unit_dx * arrow_size + unit_dy * arrow_size / 2, 
                             mid_y - unit_dy * arrow_size - unit_dx * arrow_size / 2)
 
-        arrow_head = QPolygonF([QPointF(mid_x, mid_y), arrow_p1, arrow_p2])
-        arrow_item = QGraphicsPolygonItem(arrow_head)
-        arrow_item.setBrush(QBrush(Qt.GlobalColor.black))
-        self.scene.addItem(arrow_item)
+        return QPolygonF([QPointF(mid_x, mid_y), arrow_p1, arrow_p2])
     
     def wheelEvent(self, event):
         if event.angleDelta().y() > 0:
@@ -158,45 +284,178 @@ class MapEditor(QGraphicsView):
         elif event.key() == Qt.Key.Key_T: 
             self.toggle_line_type()
         elif event.key() == Qt.Key.Key_V:
-            self.save_to_json()
+            self.save_map()
         elif event.key() == Qt.Key.Key_B:
-            self.load_from_json()
+            self.load_map()
         elif event.key() == Qt.Key.Key_C:
             self.remove_overlapping_points()
+        elif event.key() == Qt.Key.Key_M:
+            self.merge_overlapping_points()
+        elif event.key() == Qt.Key.Key_N:
+            self.toggle_snapping()
+        elif event.key() == Qt.Key.Key_R:
+            self.choose_route_point()
+        elif event.key() == Qt.Key.Key_P and self.profiler.enabled:
+            self.export_trace()
+    
+    def remove_points(self, points):
+        removed = set(points)
+        if not removed:
+            return
+        self.journal.record_remove(sorted(self.point_ids[point] for point in removed))
+        for point in removed:
+            for other in list(point.connected_points_normal):
+                self.disconnect_points(point, other, False)
+            for other in list(point.connected_points_dashed):
+                self.disconnect_points(point, other, True)
+            self.spatial_index.remove_point(point)
+        
+        self.points = [point for point in self.points if point not in removed]
+        self.point_ids = {point: i for i, point in enumerate(self.points)}
+        if self.selected_point is not None and self.selected_point[1] in removed:
+            self.scene.removeItem(self.selected_point[0])
+            self.selected_point = None
+        if self.hovered_point is not None and self.hovered_point[1] in removed:
+            self.scene.removeItem(self.hovered_point[0])
+            self.hovered_point = None
+        if self.route_start in removed:
+            self.clear_route()
+        elif self.route_end in removed:
+            self.route_end = None
+            self.refresh_route()
+        self.map_item.update()
+    
+    def point_neighbours(self, point):
+        for other in point.connected_points_normal + point.connected_points_dashed:
+            yield other, math.hypot(other.x - point.x, other.y - point.y)
+    
+    def choose_route_point(self):
+        # R over a point sets the start, then the end of the previewed route;
+        # R over empty space clears the preview.
+        if self.hovered_point is None:
+            self.clear_route()
+            return
+        
+        point = self.hovered_point[1]
+        if self.route_start is None or self.route_end is not None:
+            self.clear_route()
+            self.route_start = point
+            self.route_marker = self.highlight_point(point, Qt.GlobalColor.darkGreen)
+            self.route_tree = DynamicShortestPaths(point, self.point_neighbours)
+            print("Wybrano początek trasy")
+            return
+        
+        self.route_end = point
+        self.refresh_route()
+        distance = self.route_tree.distance(point)
+        if distance == math.inf:
+            print("Brak trasy między wybranymi punktami")
+        else:
+            print(f"Długość trasy: {distance:.1f}")
+    
+    def schedule_route_refresh(self):
+        # Edits such as merging change many connections at once, the path is
+        # redrawn once they are all done.
+        if not self.route_refresh_pending:
+            self.route_refresh_pending = True
+            QTimer.singleShot(0, self.refresh_route)
+    
+    def refresh_route(self):
+        self.route_refresh_pending = False
+        path = QPainterPath()
+        if self.route_end is not None:
+            route = self.route_tree.path_to(self.route_end)
+            if route:
+                path.moveTo(route[0].x, route[0].y)
+                for point in route[1:]:
+                    path.lineTo(point.x, point.y)
+        self.route_item.setPath(path)
+    
+    def clear_route(self):
+        if self.route_marker is not None:
+            self.scene.removeItem(self.route_marker)
+        self.route_start = None
+        self.route_end = None
+        self.route_marker = None
+        self.route_tree = None
+        self.route_item.setPath(QPainterPath())
+    
+    def find_overlaps(self):
+        points = list(self.points)
+        pairs = close_pairs([point.x for point in points], [point.y for point in points], self.overlap_radius)
+        return points, pairs
     
     def remove_overlapping_points(self):
-        min_distance = 10
-        points_to_remove = []
+        points, pairs = self.find_overlaps()
+        overlapping = [[] for _ in points]
+        for a, b in pairs:
+            overlapping[a].append(b)
+            overlapping[b].append(a)
         
-        for i, (item1, point1) in enumerate(self.points):
-            has_connections = (len(point1.connected_points_normal) > 0 or 
-                            len(point1.connected_points_dashed) > 0)
-            
-            if has_connections:
+        # An unconnected point goes if it overlaps a connected point or an
+        # earlier point that stays, so one of a stack of duplicates survives.
+        removed = set()
+        for i, point in enumerate(points):
+            if point.connected_points_normal or point.connected_points_dashed:
                 continue
-                
-            for j, (item2, point2) in enumerate(self.points):
-                if i != j:
-                    distance = ((point1.x - point2.x) ** 2 + (point1.y - point2.y) ** 2) ** 0.5
-                    if distance < min_distance:
-                        points_to_remove.append((item1, point1))
-                        break
-        
-        for item, point in points_to_remove:
-            self.scene.removeItem(item)
-            self.points.remove((item, point))
-        
-        if points_to_remove:
-            print(f"Usunięto {len(points_to_remove)} nachodzących punktów bez połączeń")
+            for j in overlapping[i]:
+                other = points[j]
+                if other.connected_points_normal or other.connected_points_dashed or (j < i and j not in removed):
+                    removed.add(i)
+                    break
+        
+        self.remove_points([points[i] for i in removed])
+        
+        if removed:
+            print(f"Usunięto {len(removed)} nachodzących punktów bez połączeń")
         else:
             print("Nie znaleziono nachodzących punktów bez połączeń")
+    
+    def merge_overlapping_points(self):
+        points, pairs = self.find_overlaps()
+        # Points already joined to each other follow one another along a
+        # street, they are not duplicates.
+        pairs = [(a, b) for a, b in pairs if not self.has_connection(points[a], points[b])]
+        degrees = [len(point.connected_points_normal) + len(point.connected_points_dashed) for point in points]
+        groups = group_pairs(len(points), pairs, degrees)
+        
+        removed = []
+        for members in groups:
+            cluster = [points[i] for i in members]
+            keeper = cluster[0]
+            
+            for point in cluster:
+                if point is keeper:
+                    continue
+                for is_dashed, neighbours in ((False, point.connected_points_normal), (True, point.connected_points_dashed)):
+                    for neighbour in neighbours:
+                        if neighbour in cluster:
+                            continue
+                        if (point, neighbour, is_dashed) in self.connections:
+                            self.connect_points(keeper, neighbour, is_dashed)
+                        else:
+                            self.connect_points(neighbour, keeper, is_dashed)
+                removed.append(point)
+        
+        self.remove_points(removed)
+        
+        if removed:
+            print(f"Scalono {len(removed) + len(groups)} nachodzących punktów w {len(groups)}")
+        else:
+            print("Nie znaleziono nachodzących punktów do scalenia")
 
     def toggle_line_type(self):
         self.dashed_line = not self.dashed_line
         self.update() 
 
+    def toggle_snapping(self):
+        self.snap_to_points = not self.snap_to_points
+        self.update()
+
     def paintEvent(self, event):
-        super().paintEvent(event)
+        self.profiler.frame()
+        with self.profiler.phase("paint"):
+            super().paintEvent(event)
 
         painter = QPainter(self.viewport())
         painter.setPen(QPen(Qt.GlobalColor.black))
@@ -204,62 +463,103 @@ class MapEditor(QGraphicsView):
         
         line_type = "Ciągła" if not self.dashed_line else "Przerywana"
         painter.drawText(10, 20, f"Aktualny typ linii: {line_type}")
+        
+        snapping = "Włączone" if self.snap_to_points else "Wyłączone"
+        painter.drawText(10, 40, f"Przyciąganie do punktów: {snapping}")
+        
+        if self.profiler.enabled:
+            for i, line in enumerate(self.profiler.hud_lines()):
+                painter.drawText(10, 70 + i * 16, line)
+    
+    def export_trace(self):
+        path = self.trace_path or "editor_trace.json"
+        self.profiler.export(path)
+        print(f"Zapisano pomiary do pliku {path}")
 
-    def save_to_json(self):
-        data = [point.to_dict() for _, point in self.points]
-        with open("points_data.json", "w") as json_file:
+    def to_graph(self):
+        ids = {point: i for i, point in enumerate(self.points)}
+        edges = list(self.connections)
+        return Graph([point.x for point in self.points], [point.y for point in self.points],
+                     [ids[p1] for p1, _, _ in edges], [ids[p2] for _, p2, _ in edges],
+                     [is_dashed for _, _, is_dashed in edges])
+    
+    def save_map(self):
+        write = self.save_to_binary if is_binary_path(self.map_path) else self.save_to_json
+        try:
+            with self.profiler.phase("save"):
+                self.journal.save_snapshot(write)
+            print(f"Stan zapisany do pliku {self.map_path}")
+        except Exception as e:
+            print(f"Wystąpił błąd podczas zapisywania: {str(e)}")
+    
+    def save_to_binary(self, path):
+        save_binary(self.to_graph(), path)
+    
+    def save_to_json(self, path):
+        data = [point.to_dict() for point in self.points]
+        with open(path, "w") as json_file:
             json.dump(data, json_file, indent=4)
-        print("Stan zapisany do pliku points_data.json")
     
-    def load_from_json(self):
+    def autosave(self):
         try:
-            with open("points_data.json", "r") as json_file:
-                data = json.load(json_file)
-            
-            for item in self.scene.items():
-                if item != self.origin_square:
-                    self.scene.removeItem(item)
-            
-            self.points = []
-            self.selected_point = None
-            
-            points_dict = {}
-            
-            for point_data in data:
-                x, y = point_data["x"], point_data["y"]
-                point_item = QGraphicsEllipseItem(x - 5, y - 5, 10, 10)
-                point_item.setBrush(QBrush(Qt.GlobalColor.blue))
-                point_item.setPen(QPen(Qt.GlobalColor.black))
-                point_item.setFlag(QGraphicsEllipseItem.GraphicsItemFlag.ItemIsSelectable)
-                self.scene.addItem(point_item)
-                
-                point = Point(x, y)
-                self.points.append((point_item, point))
-                points_dict[(x, y)] = point
-            
-            for point_data in data:
-                x, y = point_data["x"], point_data["y"]
-                current_point = points_dict[(x, y)]
-                
-                for conn in point_data["connections_normal"]:
-                    target_x, target_y = conn["x"], conn["y"]
-                    target_point = points_dict.get((target_x, target_y))
-                    
-                    if target_point:
-                        if target_point not in current_point.connected_points_normal:
-                            self.connect_points(current_point, target_point, False)
+            with self.profiler.phase("autosave"):
+                self.journal.autosave()
+        except Exception as e:
+            print(f"Wystąpił błąd podczas autozapisu: {str(e)}")
+    
+    def closeEvent(self, event):
+        self.journal.flush()
+        self.journal.close()
+        # The compaction thread is a daemon and would be killed on exit in
+        # the middle of swapping the map.
+        self.journal.wait()
+        if self.trace_path:
+            self.export_trace()
+        super().closeEvent(event)
+    
+    def clear_map(self):
+        for marker in (self.selected_point, self.hovered_point):
+            if marker is not None:
+                self.scene.removeItem(marker[0])
+        
+        self.points = []
+        self.point_ids = {}
+        self.connections = {}
+        self.spatial_index = SpatialGrid()
+        self.selected_point = None
+        self.hovered_point = None
+        self.clear_route()
+        self.map_item.reset()
+        self.map_item.update()
+    
+    def load_graph(self, graph):
+        self.clear_map()
+        
+        points = [self.create_point(x, y) for x, y in zip(graph.xs.tolist(), graph.ys.tolist())]
+        for start, end, is_dashed in zip(graph.edge_start.tolist(), graph.edge_end.tolist(), graph.edge_dashed.tolist()):
+            self.connect_points(points[start], points[end], is_dashed, record=False)
+    
+    def load_map(self):
+        try:
+            self.journal.flush()
+            # A finishing compaction swaps the map and drops the entries it
+            # folded in under this lock, so both are read from the same side
+            # of that swap.
+            with self.journal.lock:
+                try:
+                    with self.profiler.phase("load"):
+                        graph = map_loader.load_map(self.map_path)
+                    print(f"Mapa została wczytana z pliku {self.map_path}")
+                except FileNotFoundError:
+                    graph = Graph([], [], [], [])
+                    print(f"Nie znaleziono pliku {self.map_path}")
                 
-                for conn in point_data["connections_dashed"]:
-                    target_x, target_y = conn["x"], conn["y"]
-                    target_point = points_dict.get((target_x, target_y))
-                    
-                    if target_point:
-                        if target_point not in current_point.connected_points_dashed:
-                            self.connect_points(current_point, target_point, True)
-            
-            print("Mapa została wczytana z pliku points_data.json")
-        except FileNotFoundError:
-            print("Nie znaleziono pliku points_data.json")
+                with self.profiler.phase("replay"):
+                    graph = self.journal.replay(graph)
+            with self.profiler.phase("build_scene"):
+                self.load_graph(graph)
+            if self.journal.entry_count:
+                print(f"Odtworzono {self.journal.entry_count} niezapisanych zmian z dziennika")
         except json.JSONDecodeError:
             print("Błąd w formacie pliku JSON")
         except Exception as e:
@@ -267,6 +567,9 @@ class MapEditor(QGraphicsView):
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    window = MapEditor()
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    traces = [arg.split("=", 1)[1] for arg in sys.argv[1:] if arg.startswith("--trace=")]
+    window = MapEditor(args[0] if args else "points_data.json", profile="--profile" in sys.argv,
+                       trace_path=traces[0] if traces else None)
     window.show()
     sys.exit(app.exec())
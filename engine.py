@@ -0,0 +1,125 @@
+import json
+import random
+import time
+
+from fleet import Fleet
+from graph import Graph
+from instrumentation import Profiler
+import map_loader
+from routing import Router
+from scheduler import EventFleet
+
+
+class Simulation:
+    # Graph, routing and vehicles without any window; the viewer draws one
+    # of these and the headless runner steps it as fast as it can.
+    def __init__(self, map_path="points_data.json", graph_distance=False, vehicles=1, step_size=1/60.0,
+                 landmarks=0, profiler=None, events=False, vehicle_spacing=None, contract=False):
+        self.map_path = map_path
+        self.profiler = profiler or Profiler()
+        self.points = []
+        self.path = []
+        self.vehicle_speed = 100
+        self.furthest_by_graph_distance = graph_distance
+        self.step_size = step_size
+        self.time = 0.0
+        self.steps = 0
+        self.pending_time = 0.0
+        self.load_map()
+        self.router = Router(self.graph, self.map_path, landmark_count=landmarks, contract=contract)
+        if self.router.contracted is not None:
+            print(f"Routing on {self.router.contracted.graph.node_count} intersections "
+                  f"out of {self.graph.node_count} points")
+        # The event-driven fleet only works when a vehicle reaches a node and
+        # is the one that can queue vehicles at full segments.
+        if events or vehicle_spacing is not None:
+            self.fleet = EventFleet(self.graph.xs, self.graph.ys, vehicle_spacing)
+        else:
+            self.fleet = Fleet(self.graph.xs, self.graph.ys)
+        self.calculate_furthest_points_and_path()
+        self.add_random_vehicles(vehicles - len(self.fleet))
+
+    def load_map(self):
+        self.graph = Graph([], [], [], [])
+        try:
+            with self.profiler.phase("load"):
+                self.graph = map_loader.load_map(self.map_path)
+            print(f"Loaded {self.graph.node_count} points and {self.graph.edge_count} connections")
+        except FileNotFoundError:
+            print(f"File {self.map_path} not found")
+        except json.JSONDecodeError:
+            print("Error in JSON format")
+        except Exception as e:
+            print(f"Error loading data: {str(e)}")
+
+        self.points = [{"id": i, "x": x, "y": y}
+                       for i, (x, y) in enumerate(zip(self.graph.xs.tolist(), self.graph.ys.tolist()))]
+
+    def calculate_furthest_points_and_path(self):
+        if len(self.points) < 2:
+            return
+
+        pair = self.graph.furthest_pair(graph_distance=self.furthest_by_graph_distance)
+        start_point, end_point = (self.points[pair[0]], self.points[pair[1]]) if pair else (None, None)
+
+        if start_point and end_point:
+            print(f"Furthest points: ({start_point['x']}, {start_point['y']}) and ({end_point['x']}, {end_point['y']})")
+            self.path = self.find_path(start_point, end_point)
+
+            if self.path:
+                self.fleet.add_agents([[point["id"] for point in self.path]], self.vehicle_speed)
+                print(f"Path found with {len(self.path)} points")
+            else:
+                print("No path found between furthest points")
+                if self.points:
+                    self.fleet.add_agents([[self.points[0]["id"]]], self.vehicle_speed)
+
+    def add_random_vehicles(self, count):
+        if count <= 0 or len(self.points) < 2:
+            return
+
+        routes = []
+        for _ in range(count * 10):
+            if len(routes) == count:
+                break
+            start, end = random.sample(self.points, 2)
+            path = self.find_path(start, end)
+            if len(path) > 1:
+                routes.append([point["id"] for point in path])
+        self.fleet.add_agents(routes, self.vehicle_speed)
+        print(f"Added {len(routes)} vehicles with random routes")
+
+    def find_path(self, start, end):
+        with self.profiler.phase("path_search"):
+            path_ids = self.router.route(start["id"], end["id"])
+        return [self.points[point_id] for point_id in path_ids]
+
+    def step(self):
+        with self.profiler.phase("step"):
+            self.fleet.update(self.step_size)
+        self.time += self.step_size
+        self.steps += 1
+
+    def advance(self, elapsed):
+        # Real time is consumed in whole fixed steps, the rest waits for the
+        # next call, so a window and a batch run move vehicles identically.
+        self.pending_time += elapsed
+        while self.pending_time >= self.step_size:
+            self.pending_time -= self.step_size
+            self.step()
+
+    def run(self, duration):
+        steps = round(duration / self.step_size)
+        started = time.perf_counter()
+        for _ in range(steps):
+            self.step()
+        wall_time = time.perf_counter() - started
+
+        simulated = steps * self.step_size
+        return {
+            "steps": steps,
+            "simulated_seconds": simulated,
+            "wall_seconds": wall_time,
+            "speedup": simulated / wall_time if wall_time > 0 else float("inf"),
+            "agent_steps_per_second": steps * len(self.fleet) / wall_time if wall_time > 0 else float("inf"),
+        }
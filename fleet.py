@@ -0,0 +1,90 @@
+import numpy as np
+
+
+class Fleet:
+    # Agent state is kept in parallel arrays so a step moves every vehicle
+    # at once. Routes are stored back to back in one shared node buffer and
+    # every agent drives its own route forth and back between the ends.
+    def __init__(self, xs, ys):
+        self.xs = np.asarray(xs, dtype=np.float64)
+        self.ys = np.asarray(ys, dtype=np.float64)
+        self.route_nodes = np.zeros(0, dtype=np.int64)
+        self.segment_lengths = np.zeros(0, dtype=np.float64)
+
+        self.route_start = np.zeros(0, dtype=np.int64)
+        self.route_size = np.zeros(0, dtype=np.int64)
+        self.segment = np.zeros(0, dtype=np.int64)
+        self.direction = np.zeros(0, dtype=np.int64)
+        self.progress = np.zeros(0, dtype=np.float64)
+        self.speed = np.zeros(0, dtype=np.float64)
+        self.moving = np.zeros(0, dtype=np.bool_)
+
+    def __len__(self):
+        return len(self.route_start)
+
+    def add_agents(self, routes, speeds):
+        routes = [np.asarray(route, dtype=np.int64) for route in routes]
+        sizes = np.array([len(route) for route in routes], dtype=np.int64)
+        if (sizes == 0).any():
+            raise ValueError("Every route needs at least one node")
+        offsets = np.cumsum(sizes) - sizes
+        starts = len(self.route_nodes) + offsets
+        nodes = np.concatenate(routes) if routes else np.zeros(0, dtype=np.int64)
+
+        # segment_lengths[k] is the length from route_nodes[k] to the next
+        # node, zero in the slot of each route's last node.
+        lengths = np.zeros(len(nodes), dtype=np.float64)
+        lengths[:-1] = np.hypot(np.diff(self.xs[nodes]), np.diff(self.ys[nodes]))
+        lengths[offsets + sizes - 1] = 0
+        route_lengths = np.bincount(np.repeat(np.arange(len(routes)), sizes), weights=lengths,
+                                    minlength=len(routes))
+
+        self.route_nodes = np.concatenate([self.route_nodes, nodes])
+        self.segment_lengths = np.concatenate([self.segment_lengths, lengths])
+        self.route_start = np.concatenate([self.route_start, starts])
+        self.route_size = np.concatenate([self.route_size, sizes])
+        self.segment = np.concatenate([self.segment, np.zeros(len(routes), dtype=np.int64)])
+        self.direction = np.concatenate([self.direction, np.ones(len(routes), dtype=np.int64)])
+        self.progress = np.concatenate([self.progress, np.zeros(len(routes))])
+        self.speed = np.concatenate([self.speed, np.broadcast_to(np.asarray(speeds, dtype=np.float64), len(routes))])
+        # A route of a single node or of coincident nodes only has a position.
+        self.moving = np.concatenate([self.moving, (sizes > 1) & (route_lengths > 0)])
+        return np.arange(len(self) - len(routes), len(self))
+
+    def clear(self):
+        self.__init__(self.xs, self.ys)
+
+    def _current_lengths(self, agents):
+        return self.segment_lengths[self.route_start[agents] + self.segment[agents]]
+
+    def update(self, dt):
+        agents = np.flatnonzero(self.moving)
+        self.progress[agents] += self.speed[agents] * dt
+
+        # Agents that finished their segment carry the rest of the distance
+        # into the next one; each pass handles one more segment boundary.
+        while len(agents):
+            lengths = self._current_lengths(agents)
+            agents = agents[self.progress[agents] >= lengths]
+            if not len(agents):
+                break
+            self.progress[agents] -= self._current_lengths(agents)
+            self.segment[agents] += self.direction[agents]
+
+            turned = agents[(self.segment[agents] < 0) | (self.segment[agents] > self.route_size[agents] - 2)]
+            self.direction[turned] = -self.direction[turned]
+            self.segment[turned] += self.direction[turned]
+
+    def positions(self):
+        if not len(self):
+            return np.zeros(0), np.zeros(0)
+        first = self.route_start + np.minimum(self.segment, self.route_size - 1)
+        second = self.route_start + np.minimum(self.segment + 1, self.route_size - 1)
+        backwards = self.direction < 0
+        first, second = np.where(backwards, second, first), np.where(backwards, first, second)
+
+        lengths = self.segment_lengths[self.route_start + self.segment]
+        ratio = np.divide(self.progress, lengths, out=np.zeros(len(self)), where=self.moving & (lengths > 0))
+        start, end = self.route_nodes[first], self.route_nodes[second]
+        return (self.xs[start] + (self.xs[end] - self.xs[start]) * ratio,
+                self.ys[start] + (self.ys[end] - self.ys[start]) * ratio)
@@ -0,0 +1,274 @@
+import heapq
+import math
+
+import numpy as np
+
+
+class Graph:
+    def __init__(self, xs, ys, edge_start, edge_end, edge_dashed=None, edge_length=None):
+        self.xs = np.ascontiguousarray(xs, dtype=np.float64)
+        self.ys = np.ascontiguousarray(ys, dtype=np.float64)
+        self.edge_start = np.ascontiguousarray(edge_start, dtype=np.int32)
+        self.edge_end = np.ascontiguousarray(edge_end, dtype=np.int32)
+
+        if edge_dashed is None:
+            edge_dashed = np.zeros(len(self.edge_start), dtype=np.bool_)
+        self.edge_dashed = np.ascontiguousarray(edge_dashed, dtype=np.bool_)
+
+        if edge_length is None:
+            edge_length = np.hypot(self.xs[self.edge_end] - self.xs[self.edge_start],
+                                   self.ys[self.edge_end] - self.ys[self.edge_start])
+        self.edge_length = np.ascontiguousarray(edge_length, dtype=np.float64)
+
+        self._build_adjacency()
+
+    @property
+    def node_count(self):
+        return len(self.xs)
+
+    @property
+    def edge_count(self):
+        return len(self.edge_start)
+
+    def _build_adjacency(self):
+        # CSR layout: neighbours of node i are indices[indptr[i]:indptr[i + 1]],
+        # every undirected edge is stored once in each direction.
+        node_count = self.node_count
+        edge_ids = np.arange(self.edge_count, dtype=np.int32)
+        sources = np.concatenate([self.edge_start, self.edge_end])
+        targets = np.concatenate([self.edge_end, self.edge_start])
+        both_edge_ids = np.concatenate([edge_ids, edge_ids])
+
+        order = np.argsort(sources, kind="stable")
+        self.indptr = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=node_count), out=self.indptr[1:])
+        self.indices = targets[order]
+        self.adjacency_edges = both_edge_ids[order]
+        self.weights = self.edge_length[self.adjacency_edges]
+        self._lists = None
+
+    def _adjacency_lists(self):
+        # The search loops index single elements, which is much faster on
+        # plain lists than on NumPy arrays.
+        if self._lists is None:
+            self._lists = (self.indptr.tolist(), self.indices.tolist(), self.weights.tolist(),
+                           self.xs.tolist(), self.ys.tolist())
+        return self._lists
+
+    def neighbors(self, node_id):
+        start, end = self.indptr[node_id], self.indptr[node_id + 1]
+        return self.indices[start:end]
+
+    def shortest_path(self, start, end):
+        indptr, indices, weights, _, _ = self._adjacency_lists()
+        distances = [math.inf] * self.node_count
+        previous = [-1] * self.node_count
+        distances[start] = 0.0
+        unvisited = [(0.0, start)]
+
+        while unvisited:
+            current_distance, current_id = heapq.heappop(unvisited)
+            if current_id == end:
+                return self._reconstruct(previous, start, end)
+            if current_distance > distances[current_id]:
+                continue
+
+            for k in range(indptr[current_id], indptr[current_id + 1]):
+                neighbor_id = indices[k]
+                distance = current_distance + weights[k]
+                if distance < distances[neighbor_id]:
+                    distances[neighbor_id] = distance
+                    previous[neighbor_id] = current_id
+                    heapq.heappush(unvisited, (distance, neighbor_id))
+
+        return []
+
+    def astar(self, start, end):
+        indptr, indices, weights, xs, ys = self._adjacency_lists()
+        end_x, end_y = xs[end], ys[end]
+        distances = [math.inf] * self.node_count
+        previous = [-1] * self.node_count
+        distances[start] = 0.0
+        unvisited = [(math.hypot(xs[start] - end_x, ys[start] - end_y), 0.0, start)]
+
+        while unvisited:
+            _, current_distance, current_id = heapq.heappop(unvisited)
+            if current_id == end:
+                return self._reconstruct(previous, start, end)
+            if current_distance > distances[current_id]:
+                continue
+
+            for k in range(indptr[current_id], indptr[current_id + 1]):
+                neighbor_id = indices[k]
+                distance = current_distance + weights[k]
+                if distance < distances[neighbor_id]:
+                    distances[neighbor_id] = distance
+                    previous[neighbor_id] = current_id
+                    estimate = distance + math.hypot(xs[neighbor_id] - end_x, ys[neighbor_id] - end_y)
+                    heapq.heappush(unvisited, (estimate, distance, neighbor_id))
+
+        return []
+
+    def distances_from(self, start):
+        indptr, indices, weights, _, _ = self._adjacency_lists()
+        distances = [math.inf] * self.node_count
+        previous = [-1] * self.node_count
+        distances[start] = 0.0
+        unvisited = [(0.0, start)]
+
+        while unvisited:
+            current_distance, current_id = heapq.heappop(unvisited)
+            if current_distance > distances[current_id]:
+                continue
+
+            for k in range(indptr[current_id], indptr[current_id + 1]):
+                neighbor_id = indices[k]
+                distance = current_distance + weights[k]
+                if distance < distances[neighbor_id]:
+                    distances[neighbor_id] = distance
+                    previous[neighbor_id] = current_id
+                    heapq.heappush(unvisited, (distance, neighbor_id))
+
+        return distances, previous
+
+    def path_length(self, path):
+        # Parallel edges may differ in length, a path always takes the shortest.
+        indptr, indices, weights, _, _ = self._adjacency_lists()
+        total = 0.0
+        for start, end in zip(path, path[1:]):
+            total += min(weights[k] for k in range(indptr[start], indptr[start + 1]) if indices[k] == end)
+        return total
+
+    def furthest_pair(self, graph_distance=False):
+        if graph_distance:
+            return self._graph_diameter_pair()
+        return furthest_pair(self.xs, self.ys)
+
+    def _graph_diameter_pair(self):
+        # Double sweep: the node furthest from any start is (approximately) an
+        # endpoint of the graph diameter, the node furthest from it is the other.
+        if self.edge_count == 0:
+            return None
+        degrees = np.diff(self.indptr)
+        start = int(np.argmax(degrees))
+        first, _ = self._furthest_reachable(start)
+        second, distance = self._furthest_reachable(first)
+        if distance == 0:
+            return None
+        return first, second
+
+    def _furthest_reachable(self, start):
+        distances, _ = self.distances_from(start)
+        best_id, best_distance = start, 0.0
+        for node_id, distance in enumerate(distances):
+            if best_distance < distance < math.inf:
+                best_id, best_distance = node_id, distance
+        return best_id, best_distance
+
+    def _reconstruct(self, previous, start, end):
+        path = [end]
+        while path[-1] != start:
+            path.append(previous[path[-1]])
+        return path[::-1]
+
+
+def _cross(ox, oy, ax, ay, bx, by):
+    return (ax - ox) * (by - oy) - (ay - oy) * (bx - ox)
+
+
+def convex_hull(xs, ys):
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    if len(xs) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Keep the first index of every distinct coordinate, sorted by (x, y).
+    order = np.lexsort((ys, xs))
+    distinct = np.ones(len(order), dtype=np.bool_)
+    distinct[1:] = (np.diff(xs[order]) != 0) | (np.diff(ys[order]) != 0)
+    group_starts = np.flatnonzero(distinct)
+    candidates = np.minimum.reduceat(order, group_starts)
+
+    if len(candidates) > 8:
+        candidates = _discard_interior(xs, ys, candidates)
+
+    cx, cy = xs[candidates].tolist(), ys[candidates].tolist()
+    ids = candidates.tolist()
+    if len(ids) < 3:
+        return np.asarray(ids, dtype=np.int64)
+
+    lower, upper = [], []
+    for k in range(len(ids)):
+        while len(lower) >= 2 and _cross(cx[lower[-2]], cy[lower[-2]], cx[lower[-1]], cy[lower[-1]], cx[k], cy[k]) <= 0:
+            lower.pop()
+        lower.append(k)
+    for k in range(len(ids) - 1, -1, -1):
+        while len(upper) >= 2 and _cross(cx[upper[-2]], cy[upper[-2]], cx[upper[-1]], cy[upper[-1]], cx[k], cy[k]) <= 0:
+            upper.pop()
+        upper.append(k)
+
+    hull = lower[:-1] + upper[:-1]
+    return np.asarray([ids[k] for k in hull], dtype=np.int64)
+
+
+def _discard_interior(xs, ys, candidates):
+    # Akl-Toussaint: points strictly inside the quadrilateral spanned by the
+    # four axis-extreme points can never be hull vertices.
+    cx, cy = xs[candidates], ys[candidates]
+    corners = [int(np.argmin(cx + cy)), int(np.argmax(cx - cy)),
+               int(np.argmax(cx + cy)), int(np.argmin(cx - cy))]
+    inside = np.ones(len(candidates), dtype=np.bool_)
+    for a, b in zip(corners, corners[1:] + corners[:1]):
+        if cx[a] == cx[b] and cy[a] == cy[b]:
+            return candidates
+        inside &= _cross(cx[a], cy[a], cx[b], cy[b], cx, cy) > 0
+    return candidates[~inside]
+
+
+def furthest_pair(xs, ys):
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    hull = convex_hull(xs, ys).tolist()
+    if len(hull) < 2:
+        return None
+
+    hx, hy = xs[hull].tolist(), ys[hull].tolist()
+    count = len(hull)
+
+    def distance(a, b):
+        return math.sqrt((hx[a] - hx[b]) ** 2 + (hy[a] - hy[b]) ** 2)
+
+    # Rotating calipers: collect every antipodal pair of the hull.
+    pairs = []
+    if count == 2:
+        pairs.append((0, 1))
+    else:
+        j = 1
+        for i in range(count):
+            i_next = (i + 1) % count
+            while True:
+                j_next = (j + 1) % count
+                current = abs(_cross(hx[i], hy[i], hx[i_next], hy[i_next], hx[j], hy[j]))
+                advanced = abs(_cross(hx[i], hy[i], hx[i_next], hy[i_next], hx[j_next], hy[j_next]))
+                # Nearly parallel edges have two antipodal vertices each side;
+                # keep all of them so rounding cannot hide a tied pair.
+                if abs(advanced - current) <= 1e-9 * max(advanced, current):
+                    pairs.extend([(i, j), (i_next, j), (i, j_next), (i_next, j_next)])
+                if advanced <= current:
+                    break
+                j = j_next
+            pairs.append((i, j))
+            pairs.append((i_next, j))
+
+    best_distance = max(distance(a, b) for a, b in pairs)
+    if best_distance == 0:
+        return None
+
+    # Ties resolve to the lowest (i, j) pair, like a plain nested loop would.
+    best_pair = None
+    for a, b in pairs:
+        if distance(a, b) == best_distance:
+            pair = tuple(sorted((hull[a], hull[b])))
+            if best_pair is None or pair < best_pair:
+                best_pair = pair
+    return best_pair
@@ -0,0 +1,51 @@
+import sys
+
+from engine import Simulation
+from instrumentation import Profiler
+
+
+def option(name, default):
+    values = [arg.split("=", 1)[1] for arg in sys.argv[1:] if arg.startswith(f"--{name}=")]
+    return type(default)(values[0]) if values else default
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    duration = option("duration", 60.0)
+    report_every = option("report-every", 0.0)
+    trace_path = option("trace", "")
+    profiler = Profiler(enabled=bool(trace_path))
+
+    simulation = Simulation(map_path=args[0] if args else "points_data.json",
+                            graph_distance="--graph-distance" in sys.argv,
+                            vehicles=option("vehicles", 1),
+                            step_size=1 / option("rate", 60.0),
+                            landmarks=option("landmarks", 0),
+                            profiler=profiler,
+                            events="--events" in sys.argv,
+                            vehicle_spacing=option("spacing", 0.0) or None,
+                            contract="--contract" in sys.argv)
+
+    chunks = [duration] if report_every <= 0 else [report_every] * int(duration // report_every)
+    if duration - sum(chunks) >= simulation.step_size / 2:
+        chunks.append(duration - sum(chunks))
+
+    total_steps, total_wall = 0, 0.0
+    for chunk in chunks:
+        stats = simulation.run(chunk)
+        total_steps += stats["steps"]
+        total_wall += stats["wall_seconds"]
+        if report_every > 0:
+            print(f"t={simulation.time:.1f}s  {stats['speedup']:.1f}x real time  "
+                  f"{stats['agent_steps_per_second']:.0f} agent-steps/s")
+
+    simulated = total_steps * simulation.step_size
+    print(f"Simulated {simulated:.1f}s with {len(simulation.fleet)} vehicles in {total_wall:.3f}s of wall time")
+    if total_wall > 0:
+        print(f"Throughput: {simulated / total_wall:.1f} simulated seconds per wall second, "
+              f"{total_steps * len(simulation.fleet) / total_wall:.0f} agent-steps per second")
+    if hasattr(simulation.fleet, "arrivals"):
+        print(f"{simulation.fleet.arrivals} node arrivals, {simulation.fleet.queued()} vehicles queued at the end")
+    if trace_path:
+        profiler.export(trace_path)
+        print(f"Trace written to {trace_path}")
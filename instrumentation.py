@@ -0,0 +1,71 @@
+import csv
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class Profiler:
+    # Opt-in timing of named phases. Recent durations feed the on-screen HUD,
+    # the full event list is kept for export as CSV or a Chrome trace.
+    def __init__(self, enabled=False, history=120, max_events=1000000):
+        self.enabled = enabled
+        self.history = history
+        self.started = time.perf_counter()
+        self.events = deque(maxlen=max_events)
+        self.recent = {}
+        self.frame_times = deque(maxlen=history)
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self.events.append((name, start - self.started, duration, threading.get_ident()))
+            if name not in self.recent:
+                self.recent[name] = deque(maxlen=self.history)
+            self.recent[name].append(duration)
+
+    def frame(self):
+        if self.enabled:
+            self.frame_times.append(time.perf_counter())
+
+    def fps(self):
+        if len(self.frame_times) < 2:
+            return 0.0
+        return (len(self.frame_times) - 1) / (self.frame_times[-1] - self.frame_times[0])
+
+    def hud_lines(self):
+        lines = [f"FPS: {self.fps():.1f}"]
+        for name, durations in self.recent.items():
+            lines.append(f"{name}: {sum(durations) / len(durations) * 1000:.2f} ms")
+        return lines
+
+    def export_csv(self, path):
+        with open(path, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(["phase", "start_ms", "duration_ms", "thread"])
+            for name, start, duration, thread in list(self.events):
+                writer.writerow([name, f"{start * 1000:.3f}", f"{duration * 1000:.3f}", thread])
+
+    def export_chrome_trace(self, path):
+        # Complete ("X") events in microseconds, readable by chrome://tracing
+        # and Perfetto.
+        events = [{"name": name, "ph": "X", "ts": start * 1e6, "dur": duration * 1e6,
+                   "pid": os.getpid(), "tid": thread}
+                  for name, start, duration, thread in list(self.events)]
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
+
+    def export(self, path):
+        if path.endswith(".csv"):
+            self.export_csv(path)
+        else:
+            self.export_chrome_trace(path)
@@ -0,0 +1,244 @@
+import json
+import os
+import threading
+
+from graph import Graph
+import map_format
+import map_loader
+
+
+class MapState:
+    # Plain copy of the map used to replay journal entries on top of a
+    # snapshot without any GUI objects. Points are addressed by their
+    # position in the map, which is the order the editor keeps them in.
+    def __init__(self, xs, ys, edges):
+        self.xs = xs
+        self.ys = ys
+        self.edges = edges
+
+    @classmethod
+    def from_graph(cls, graph):
+        state = cls(graph.xs.tolist(), graph.ys.tolist(), {})
+        for start, end, dashed in zip(graph.edge_start.tolist(), graph.edge_end.tolist(), graph.edge_dashed.tolist()):
+            state.connect(start, end, dashed)
+        return state
+
+    def add_point(self, x, y):
+        self.xs.append(x)
+        self.ys.append(y)
+
+    def connect(self, a, b, dashed):
+        # Same rule as the editor and map_loader: one connection per pair of
+        # points, whichever line type it has.
+        if any(key in self.edges for key in ((a, b, False), (b, a, False), (a, b, True), (b, a, True))):
+            return
+        self.edges[(a, b, dashed)] = None
+
+    def remove_points(self, ids):
+        removed = set(ids)
+        new_ids, kept = {}, 0
+        for i in range(len(self.xs)):
+            if i not in removed:
+                new_ids[i] = kept
+                kept += 1
+        self.xs = [x for i, x in enumerate(self.xs) if i not in removed]
+        self.ys = [y for i, y in enumerate(self.ys) if i not in removed]
+        self.edges = {(new_ids[a], new_ids[b], dashed): None for a, b, dashed in self.edges
+                      if a not in removed and b not in removed}
+
+    def apply(self, entry):
+        if entry["op"] == "add":
+            self.add_point(entry["x"], entry["y"])
+        elif entry["op"] == "connect":
+            self.connect(entry["a"], entry["b"], entry["dashed"])
+        elif entry["op"] == "remove":
+            self.remove_points(entry["ids"])
+
+    def to_graph(self):
+        edges = list(self.edges)
+        return Graph(self.xs, self.ys, [a for a, _, _ in edges], [b for _, b, _ in edges],
+                     [dashed for _, _, dashed in edges])
+
+
+def read_entries(path):
+    entries = []
+    with open(path, "r") as journal_file:
+        for line in journal_file:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A crash can leave the last line half written.
+                break
+    return entries
+
+
+def file_stamp(path):
+    # os.replace keeps the inode, size and modification time of the file it
+    # moves, so a snapshot keeps its stamp once it becomes the map.
+    info = os.stat(path)
+    return [info.st_ino, info.st_size, info.st_mtime_ns]
+
+
+class EditJournal:
+    def __init__(self, map_path, compact_after=5000):
+        self.map_path = map_path
+        self.journal_path = map_path + ".journal"
+        self.compacting_path = map_path + ".journal.compacting"
+        self.commit_path = map_path + ".journal.commit"
+        self.compact_after = compact_after
+        self.entry_count = 0
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.thread = None
+        self.file = None
+
+    def _open(self):
+        self.file = open(self.journal_path, "a+")
+        # Drop a half written entry left by a crash before appending to it.
+        self.file.seek(0)
+        content = self.file.read()
+        if content and not content.endswith("\n"):
+            self.file.truncate(content.rfind("\n") + 1)
+
+    def _write(self, entry):
+        if self.file is None:
+            self._open()
+        self.file.write(json.dumps(entry) + "\n")
+        self.entry_count += 1
+
+    def record_add(self, x, y):
+        self._write({"op": "add", "x": x, "y": y})
+
+    def record_connect(self, a, b, dashed):
+        self._write({"op": "connect", "a": a, "b": b, "dashed": dashed})
+
+    def record_remove(self, ids):
+        self._write({"op": "remove", "ids": ids})
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _commit(self, snapshot_path, folded_paths):
+        # Swapping the map and deleting the journal files folded into it are
+        # two steps. The commit file written first names the snapshot and
+        # the folded files, so a crash between them can be finished on the
+        # next load instead of replaying those entries a second time.
+        with open(self.commit_path, "w") as commit_file:
+            json.dump({"snapshot": file_stamp(snapshot_path), "folded": folded_paths}, commit_file)
+            commit_file.flush()
+            os.fsync(commit_file.fileno())
+        os.replace(snapshot_path, self.map_path)
+        for path in folded_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        os.remove(self.commit_path)
+
+    def _recover(self):
+        if not os.path.exists(self.commit_path):
+            return
+        try:
+            with open(self.commit_path, "r") as commit_file:
+                commit = json.load(commit_file)
+        except json.JSONDecodeError:
+            # Cut short while being written, so the map was never swapped.
+            commit = None
+        if commit is not None and os.path.exists(self.map_path) and file_stamp(self.map_path) == commit["snapshot"]:
+            for path in commit["folded"]:
+                if os.path.exists(path):
+                    os.remove(path)
+        os.remove(self.commit_path)
+
+    def pending_entries(self):
+        self._recover()
+        entries = []
+        for path in (self.compacting_path, self.journal_path):
+            if os.path.exists(path):
+                entries.extend(read_entries(path))
+        return entries
+
+    def replay(self, graph):
+        entries = self.pending_entries()
+        self.entry_count = len(entries)
+        if not entries:
+            return graph
+        state = MapState.from_graph(graph)
+        for entry in entries:
+            state.apply(entry)
+        return state.to_graph()
+
+    def _temporary_path(self, name):
+        base, extension = os.path.splitext(self.map_path)
+        return f"{base}.{name}{extension}"
+
+    def save_snapshot(self, write):
+        # The snapshot is written next to the map and swapped in atomically,
+        # after which every journal entry it contains can be dropped.
+        temporary_path = self._temporary_path("saving")
+        write(temporary_path)
+        with self.lock:
+            self.generation += 1
+            self.close()
+            self._commit(temporary_path, [self.journal_path, self.compacting_path])
+            self.entry_count = 0
+
+    def compacting(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
+
+    def compact(self):
+        if self.compacting():
+            return
+        self.close()
+        if os.path.exists(self.journal_path):
+            with open(self.compacting_path, "a") as compacting_file:
+                for entry in read_entries(self.journal_path):
+                    compacting_file.write(json.dumps(entry) + "\n")
+                compacting_file.flush()
+                os.fsync(compacting_file.fileno())
+            os.remove(self.journal_path)
+        if not os.path.exists(self.compacting_path):
+            return
+
+        self.entry_count = 0
+        self.thread = threading.Thread(target=self._compact, args=(self.generation,), daemon=True)
+        self.thread.start()
+
+    def _compact(self, generation):
+        try:
+            try:
+                graph = map_loader.load_map(self.map_path)
+            except FileNotFoundError:
+                graph = Graph([], [], [], [])
+            state = MapState.from_graph(graph)
+            for entry in read_entries(self.compacting_path):
+                state.apply(entry)
+
+            temporary_path = self._temporary_path("compacted")
+            map_format.save_map(state.to_graph(), temporary_path)
+        except Exception as e:
+            # A snapshot saved meanwhile removes the files being compacted,
+            # otherwise the entries stay in the journal for the next attempt.
+            if generation == self.generation:
+                print(f"Journal compaction failed: {str(e)}")
+            return
+
+        with self.lock:
+            if generation != self.generation:
+                os.remove(temporary_path)
+                return
+            self._commit(temporary_path, [self.compacting_path])
+
+    def autosave(self):
+        self.flush()
+        if self.entry_count >= self.compact_after:
+            self.compact()
@@ -0,0 +1,99 @@
+import json
+import mmap
+import struct
+import sys
+
+import numpy as np
+
+from graph import Graph
+
+# Layout: a 32 byte header followed by 8-byte aligned arrays
+#   xs, ys           float64[node_count]
+#   edge_start, end  int32[edge_count]
+#   edge_dashed      uint8[edge_count]
+#   edge_length      float64[edge_count]   (only with FLAG_EDGE_LENGTH)
+MAGIC = b"SMAP"
+VERSION = 1
+FLAG_EDGE_LENGTH = 1
+HEADER = struct.Struct("<4sIQQI4x")
+
+
+def _aligned(offset):
+    return (offset + 7) // 8 * 8
+
+
+def _sections(node_count, edge_count, flags):
+    sections = [("xs", np.float64, node_count), ("ys", np.float64, node_count),
+                ("edge_start", np.int32, edge_count), ("edge_end", np.int32, edge_count),
+                ("edge_dashed", np.bool_, edge_count)]
+    if flags & FLAG_EDGE_LENGTH:
+        sections.append(("edge_length", np.float64, edge_count))
+
+    offset = HEADER.size
+    for name, dtype, count in sections:
+        yield name, dtype, count, offset
+        offset = _aligned(offset + np.dtype(dtype).itemsize * count)
+
+
+def save_binary(graph, path, include_length=True):
+    flags = FLAG_EDGE_LENGTH if include_length else 0
+    with open(path, "wb") as binary_file:
+        binary_file.write(HEADER.pack(MAGIC, VERSION, graph.node_count, graph.edge_count, flags))
+        for name, dtype, count, offset in _sections(graph.node_count, graph.edge_count, flags):
+            binary_file.write(b"\0" * (offset - binary_file.tell()))
+            binary_file.write(np.ascontiguousarray(getattr(graph, name), dtype=dtype).tobytes())
+
+
+def load_binary(path):
+    with open(path, "rb") as binary_file:
+        if binary_file.seek(0, 2) == 0:
+            raise ValueError(f"{path} is empty")
+        mapped = mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, node_count, edge_count, flags = HEADER.unpack_from(mapped)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a binary map file")
+    if version != VERSION:
+        raise ValueError(f"Unsupported binary map version {version}")
+
+    # Arrays are views straight into the mapping, pages are read on demand.
+    arrays = {name: np.frombuffer(mapped, dtype=dtype, count=count, offset=offset)
+              for name, dtype, count, offset in _sections(node_count, edge_count, flags)}
+    return Graph(arrays["xs"], arrays["ys"], arrays["edge_start"], arrays["edge_end"],
+                 arrays["edge_dashed"], arrays.get("edge_length"))
+
+
+def save_json(graph, path):
+    xs, ys = graph.xs.tolist(), graph.ys.tolist()
+    data = [{"x": x, "y": y, "connections_normal": [], "connections_dashed": []} for x, y in zip(xs, ys)]
+    for start, end, dashed in zip(graph.edge_start.tolist(), graph.edge_end.tolist(), graph.edge_dashed.tolist()):
+        key = "connections_dashed" if dashed else "connections_normal"
+        direction = [xs[end] - xs[start], ys[end] - ys[start]]
+        data[start][key].append({"x": xs[end], "y": ys[end], "direction": direction})
+        data[end][key].append({"x": xs[start], "y": ys[start], "direction": [-direction[0], -direction[1]]})
+
+    with open(path, "w") as json_file:
+        json.dump(data, json_file, indent=4)
+
+
+def is_binary_path(path):
+    return path.endswith(".smap")
+
+
+def save_map(graph, path):
+    if is_binary_path(path):
+        save_binary(graph, path)
+    else:
+        save_json(graph, path)
+
+
+if __name__ == "__main__":
+    from map_loader import load_map
+
+    if len(sys.argv) != 3:
+        print("Usage: python map_format.py <input.json|input.smap> <output.json|output.smap>")
+        sys.exit(1)
+
+    graph = load_map(sys.argv[1])
+    save_map(graph, sys.argv[2])
+    print(f"Converted {graph.node_count} points and {graph.edge_count} connections to {sys.argv[2]}")
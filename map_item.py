@@ -0,0 +1,110 @@
+from PyQt6.QtCore import QPointF, QRectF, Qt
+from PyQt6.QtGui import QBrush, QPen, QPixmap, QPolygonF
+from PyQt6.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+
+from tiles import TileCache
+
+POINT_SIZE = 10
+ARROW_SIZE = 10
+# Arrows and points are left out once they would be smaller than this on
+# screen, in pixels.
+ARROW_MIN_SIZE = 4
+POINT_MIN_SIZE = 3
+# Decoded background tiles kept in memory, about 64 MB at 256x256.
+TILE_CACHE_SIZE = 256
+
+
+class MapItem(QGraphicsItem):
+    # One item paints the whole map in bulk. Only the part exposed on screen
+    # is looked up in the editor's spatial index and drawn.
+    def __init__(self, editor):
+        super().__init__()
+        self.editor = editor
+        self.bounds = None
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption)
+
+        self.solid_pen = QPen(Qt.GlobalColor.black, 2)
+        self.dashed_pen = QPen(Qt.GlobalColor.black, 2)
+        self.dashed_pen.setStyle(Qt.PenStyle.DashLine)
+        self.arrow_pen = QPen(Qt.GlobalColor.black)
+        self.arrow_brush = QBrush(Qt.GlobalColor.black)
+        # Round points drawn with a thick pen look like the outlined circles
+        # of the old per-point ellipse items.
+        self.point_outline_pen = QPen(Qt.GlobalColor.black, POINT_SIZE + 1, Qt.PenStyle.SolidLine,
+                                      Qt.PenCapStyle.RoundCap)
+        self.point_fill_pen = QPen(Qt.GlobalColor.blue, POINT_SIZE - 1, Qt.PenStyle.SolidLine,
+                                   Qt.PenCapStyle.RoundCap)
+
+    def include(self, x, y):
+        if self.bounds is None:
+            self.prepareGeometryChange()
+            self.bounds = [x, y, x, y]
+        elif not (self.bounds[0] <= x <= self.bounds[2] and self.bounds[1] <= y <= self.bounds[3]):
+            self.prepareGeometryChange()
+            self.bounds = [min(self.bounds[0], x), min(self.bounds[1], y),
+                           max(self.bounds[2], x), max(self.bounds[3], y)]
+
+    def reset(self):
+        self.prepareGeometryChange()
+        self.bounds = None
+
+    def boundingRect(self):
+        if self.bounds is None:
+            return QRectF()
+        margin = POINT_SIZE + ARROW_SIZE
+        return QRectF(self.bounds[0] - margin, self.bounds[1] - margin,
+                      self.bounds[2] - self.bounds[0] + 2 * margin, self.bounds[3] - self.bounds[1] + 2 * margin)
+
+    def paint(self, painter, option, widget=None):
+        rect = option.exposedRect.adjusted(-ARROW_SIZE, -ARROW_SIZE, ARROW_SIZE, ARROW_SIZE)
+        left, top, right, bottom = rect.left(), rect.top(), rect.right(), rect.bottom()
+        detail = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        spatial_index = self.editor.spatial_index
+
+        solid, dashed, arrows = [], [], []
+        for key in spatial_index.edges_in_rect(left, top, right, bottom):
+            line, arrow = self.editor.connections[key]
+            (dashed if key[2] else solid).append(line)
+            if arrow is not None:
+                arrows.append(arrow)
+
+        painter.setPen(self.solid_pen)
+        painter.drawLines(solid)
+        painter.setPen(self.dashed_pen)
+        painter.drawLines(dashed)
+
+        if arrows and ARROW_SIZE * detail >= ARROW_MIN_SIZE:
+            painter.setPen(self.arrow_pen)
+            painter.setBrush(self.arrow_brush)
+            for arrow in arrows:
+                painter.drawPolygon(arrow)
+
+        if POINT_SIZE * detail >= POINT_MIN_SIZE:
+            points = QPolygonF([QPointF(point.x, point.y)
+                                for point in spatial_index.points_in_rect(left, top, right, bottom)])
+            painter.setPen(self.point_outline_pen)
+            painter.drawPoints(points)
+            painter.setPen(self.point_fill_pen)
+            painter.drawPoints(points)
+
+
+class TileItem(QGraphicsItem):
+    # Background image cut into a tile pyramid; paint picks the level that
+    # matches the zoom and draws only the tiles in the exposed rect.
+    def __init__(self, pyramid, cache_size=TILE_CACHE_SIZE):
+        super().__init__()
+        self.pyramid = pyramid
+        self.cache = TileCache(lambda key: QPixmap(pyramid.tile_path(*key)), cache_size)
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption)
+
+    def boundingRect(self):
+        return QRectF(self.pyramid.left, self.pyramid.top, self.pyramid.width, self.pyramid.height)
+
+    def paint(self, painter, option, widget=None):
+        rect = option.exposedRect
+        detail = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        level = self.pyramid.level_for(detail)
+        for key in self.pyramid.tiles_in_rect(level, rect.left(), rect.top(), rect.right(), rect.bottom()):
+            pixmap = self.cache.get(key)
+            if not pixmap.isNull():
+                painter.drawPixmap(QRectF(*self.pyramid.tile_rect(*key)), pixmap, QRectF(pixmap.rect()))
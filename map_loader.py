@@ -0,0 +1,124 @@
+import json
+from array import array
+
+import numpy as np
+
+from graph import Graph
+from map_format import is_binary_path, load_binary
+
+COORDINATE = np.dtype([("x", np.float64), ("y", np.float64)])
+
+
+def iter_json_array(path, chunk_size=1 << 16):
+    # Yields the elements of a top-level JSON array one at a time, so only
+    # the element being decoded is ever held in memory.
+    decoder = json.JSONDecoder()
+    with open(path, "r") as json_file:
+        buffer, pos, eof = "", 0, False
+
+        def fill():
+            nonlocal buffer, pos, eof
+            chunk = json_file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            return not eof
+
+        def next_char():
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos].isspace():
+                    pos += 1
+                if pos < len(buffer):
+                    return buffer[pos]
+                if not fill():
+                    raise json.JSONDecodeError("Unexpected end of file", buffer, pos)
+
+        if next_char() != "[":
+            raise json.JSONDecodeError("Expecting '['", buffer, pos)
+        pos += 1
+        if next_char() == "]":
+            return
+
+        while True:
+            next_char()
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+                complete = end < len(buffer) or eof
+            except json.JSONDecodeError:
+                complete = False
+            if not complete:
+                if not fill():
+                    element, end = decoder.raw_decode(buffer, pos)
+                continue
+
+            yield element
+            pos = end
+            separator = next_char()
+            pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos - 1)
+
+
+def _coordinates(xs, ys):
+    coordinates = np.empty(len(xs), dtype=COORDINATE)
+    coordinates["x"] = xs
+    coordinates["y"] = ys
+    return coordinates
+
+
+def resolve_points(xs, ys, query_xs, query_ys):
+    # Maps query coordinates to point ids, -1 where there is no point. Like
+    # a dict keyed by (x, y), the last of several equal points wins.
+    if len(xs) == 0:
+        return np.full(len(query_xs), -1, dtype=np.int64)
+    order = np.lexsort((np.arange(len(xs)), ys, xs))
+    sorted_xs, sorted_ys = xs[order], ys[order]
+    last = np.ones(len(order), dtype=np.bool_)
+    last[:-1] = (sorted_xs[1:] != sorted_xs[:-1]) | (sorted_ys[1:] != sorted_ys[:-1])
+    keys = _coordinates(sorted_xs[last], sorted_ys[last])
+    ids = order[last]
+
+    found = np.minimum(np.searchsorted(keys, _coordinates(query_xs, query_ys)), len(keys) - 1)
+    matches = (keys["x"][found] == query_xs) & (keys["y"][found] == query_ys)
+    return np.where(matches, ids[found], -1)
+
+
+def build_graph(xs, ys, edge_source, target_xs, target_ys, edge_dashed):
+    sources = resolve_points(xs, ys, xs[edge_source], ys[edge_source])
+    targets = resolve_points(xs, ys, target_xs, target_ys)
+    valid = targets >= 0
+    sources, targets, edge_dashed = sources[valid], targets[valid], edge_dashed[valid]
+
+    # An edge is kept the first time its pair of ids shows up, in either
+    # direction and whichever line type it has.
+    pair_keys = np.minimum(sources, targets) * len(xs) + np.maximum(sources, targets)
+    _, first = np.unique(pair_keys, return_index=True)
+    first.sort()
+    return Graph(xs, ys, sources[first], targets[first], edge_dashed[first])
+
+
+def load_json(path):
+    xs, ys = array("d"), array("d")
+    edge_source, target_xs, target_ys, edge_dashed = array("q"), array("d"), array("d"), array("b")
+
+    for index, point_data in enumerate(iter_json_array(path)):
+        xs.append(point_data["x"])
+        ys.append(point_data["y"])
+        for dashed, key in ((False, "connections_normal"), (True, "connections_dashed")):
+            for conn in point_data[key]:
+                edge_source.append(index)
+                target_xs.append(conn["x"])
+                target_ys.append(conn["y"])
+                edge_dashed.append(dashed)
+
+    return build_graph(np.frombuffer(xs, dtype=np.float64), np.frombuffer(ys, dtype=np.float64),
+                       np.frombuffer(edge_source, dtype=np.int64),
+                       np.frombuffer(target_xs, dtype=np.float64), np.frombuffer(target_ys, dtype=np.float64),
+                       np.frombuffer(edge_dashed, dtype=np.int8).astype(np.bool_))
+
+
+def load_map(path):
+    return load_binary(path) if is_binary_path(path) else load_json(path)
@@ -0,0 +1,114 @@
+import math
+import sys
+
+import numpy as np
+
+from graph import Graph
+import map_format
+
+
+def _finish(rng, xs, ys, edge_start, edge_end, dashed_ratio):
+    # Arrows point a random way along each street and a share of the
+    # streets is drawn dashed, like the hand traced maps.
+    flip = rng.random(len(edge_start)) < 0.5
+    edge_start, edge_end = np.where(flip, edge_end, edge_start), np.where(flip, edge_start, edge_end)
+    dashed = rng.random(len(edge_start)) < dashed_ratio
+    return Graph(xs, ys, edge_start, edge_end, dashed)
+
+
+def grid_city(rows, cols, spacing=40.0, jitter=0.2, drop_ratio=0.1, dashed_ratio=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    row_ids, col_ids = np.divmod(np.arange(rows * cols), cols)
+    xs = (col_ids - cols / 2) * spacing + rng.uniform(-jitter, jitter, rows * cols) * spacing
+    ys = (row_ids - rows / 2) * spacing + rng.uniform(-jitter, jitter, rows * cols) * spacing
+
+    ids = np.arange(rows * cols).reshape(rows, cols)
+    edge_start = np.concatenate([ids[:, :-1].ravel(), ids[:-1, :].ravel()])
+    edge_end = np.concatenate([ids[:, 1:].ravel(), ids[1:, :].ravel()])
+    # Dropping a few streets gives irregular blocks and dead ends.
+    keep = rng.random(len(edge_start)) >= drop_ratio
+    return _finish(rng, xs, ys, edge_start[keep], edge_end[keep], dashed_ratio)
+
+
+def pairs_within(xs, ys, radius):
+    # Vectorized counterpart of spatial.close_pairs: points are bucketed by
+    # the radius and every bucket is matched against half its neighbourhood.
+    cell_xs = np.floor(xs / radius).astype(np.int64)
+    cell_ys = np.floor(ys / radius).astype(np.int64)
+    cell_xs -= cell_xs.min() - 1
+    cell_ys -= cell_ys.min() - 1
+    width = int(cell_xs.max()) + 2
+    keys = cell_ys * width + cell_xs
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    firsts, seconds = [], []
+    for dx, dy in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):
+        target_keys = keys + dy * width + dx
+        low = np.searchsorted(sorted_keys, target_keys, side="left")
+        counts = np.searchsorted(sorted_keys, target_keys, side="right") - low
+        first = np.repeat(np.arange(len(xs)), counts)
+        offsets = np.arange(len(first)) - np.repeat(np.cumsum(counts) - counts, counts)
+        second = order[np.repeat(low, counts) + offsets]
+        keep = (xs[first] - xs[second]) ** 2 + (ys[first] - ys[second]) ** 2 < radius * radius
+        if dx == 0 and dy == 0:
+            keep &= first < second
+        firsts.append(first[keep])
+        seconds.append(second[keep])
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def random_geometric(count, degree=6.0, spacing=20.0, dashed_ratio=0.0, seed=0):
+    # Uniform points with an edge between every pair closer than the radius
+    # that gives the requested average degree.
+    rng = np.random.default_rng(seed)
+    size = spacing * math.sqrt(count)
+    xs = rng.uniform(-size / 2, size / 2, count)
+    ys = rng.uniform(-size / 2, size / 2, count)
+    radius = spacing * math.sqrt(degree / math.pi)
+    edge_start, edge_end = pairs_within(xs, ys, radius)
+    return _finish(rng, xs, ys, edge_start, edge_end, dashed_ratio)
+
+
+def subdivide(graph, pieces, bend=0.1, seed=0):
+    # Splits every street into pieces joined by chain points pushed slightly
+    # sideways, like a curve traced by hand.
+    if pieces <= 1:
+        return graph
+    rng = np.random.default_rng(seed)
+    edge_count, inner = graph.edge_count, pieces - 1
+    x1, y1 = graph.xs[graph.edge_start], graph.ys[graph.edge_start]
+    dx, dy = graph.xs[graph.edge_end] - x1, graph.ys[graph.edge_end] - y1
+    steps = np.arange(1, pieces) / pieces
+    sideways = rng.uniform(-bend, bend, (edge_count, inner))
+    xs = (x1[:, None] + dx[:, None] * steps - dy[:, None] * sideways).ravel()
+    ys = (y1[:, None] + dy[:, None] * steps + dx[:, None] * sideways).ravel()
+
+    new_ids = (graph.node_count + np.arange(edge_count * inner)).reshape(edge_count, inner)
+    chain = np.column_stack([graph.edge_start, new_ids, graph.edge_end])
+    return Graph(np.concatenate([graph.xs, xs]), np.concatenate([graph.ys, ys]), chain[:, :-1].ravel(),
+                 chain[:, 1:].ravel(), np.repeat(graph.edge_dashed, pieces))
+
+
+def generate(kind, nodes, dashed_ratio=0.0, seed=0):
+    if kind == "grid":
+        cols = max(int(math.sqrt(nodes)), 1)
+        return grid_city(max(nodes // cols, 1), cols, dashed_ratio=dashed_ratio, seed=seed)
+    if kind == "geometric":
+        return random_geometric(nodes, dashed_ratio=dashed_ratio, seed=seed)
+    raise ValueError(f"Unknown map kind {kind}")
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--") and "=" in arg)
+    if len(args) != 2:
+        print("Usage: python mapgen.py <grid|geometric> <output.json|output.smap> "
+              "[--nodes=N] [--dashed=RATIO] [--seed=N] [--subdivide=N]")
+        sys.exit(1)
+
+    graph = generate(args[0], int(options.get("nodes", 10000)), float(options.get("dashed", 0.0)),
+                     int(options.get("seed", 0)))
+    graph = subdivide(graph, int(options.get("subdivide", 1)), seed=int(options.get("seed", 0)))
+    map_format.save_map(graph, args[1])
+    print(f"Generated {graph.node_count} points and {graph.edge_count} connections in {args[1]}")
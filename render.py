@@ -0,0 +1,467 @@
+import numpy as np
+import pyglet
+from pyglet.gl import (GL_BLEND, GL_ONE_MINUS_SRC_ALPHA, GL_POINTS, GL_PROGRAM_POINT_SIZE, GL_SRC_ALPHA,
+                       GL_TRIANGLES, glBlendFunc, glDisable, glEnable)
+from pyglet.graphics import Group
+
+from tiles import TileCache
+
+# World-space geometry is moved by the window view matrix (pan and zoom),
+# while line thickness, arrowheads and markers keep a constant size on
+# screen through a per-vertex offset given in pixels.
+shape_vertex_source = """#version 150 core
+    in vec2 position;
+    in vec2 offset;
+    in vec4 colors;
+
+    out vec4 vertex_colors;
+
+    uniform WindowBlock
+    {
+        mat4 projection;
+        mat4 view;
+    } window;
+
+    void main()
+    {
+        vec4 screen_position = window.view * vec4(position, 0.0, 1.0);
+        gl_Position = window.projection * (screen_position + vec4(offset, 0.0, 0.0));
+        vertex_colors = colors;
+    }
+"""
+
+shape_fragment_source = """#version 150 core
+    in vec4 vertex_colors;
+    out vec4 final_color;
+
+    void main()
+    {
+        final_color = vertex_colors;
+    }
+"""
+
+# Dashed edges are drawn as whole quads; each vertex carries its distance
+# along the edge in world units, scaled to pixels by the zoom held in the
+# view matrix, and fragments falling in a gap are discarded. The pattern
+# stays the same size on screen without rebuilding geometry on zoom.
+dash_vertex_source = """#version 150 core
+    in vec2 position;
+    in vec2 offset;
+    in vec4 colors;
+    in float distance;
+
+    out vec4 vertex_colors;
+    out float screen_distance;
+
+    uniform WindowBlock
+    {
+        mat4 projection;
+        mat4 view;
+    } window;
+
+    void main()
+    {
+        vec4 screen_position = window.view * vec4(position, 0.0, 1.0);
+        gl_Position = window.projection * (screen_position + vec4(offset, 0.0, 0.0));
+        vertex_colors = colors;
+        screen_distance = distance * length(window.view[0].xy);
+    }
+"""
+
+dash_fragment_source = """#version 150 core
+    in vec4 vertex_colors;
+    in float screen_distance;
+    out vec4 final_color;
+
+    uniform float dash_length;
+    uniform float gap_length;
+
+    void main()
+    {
+        if (mod(screen_distance, dash_length + gap_length) > dash_length)
+            discard;
+        final_color = vertex_colors;
+    }
+"""
+
+node_vertex_source = """#version 150 core
+    in vec2 position;
+    in vec4 colors;
+
+    out vec4 vertex_colors;
+
+    uniform float point_size;
+
+    uniform WindowBlock
+    {
+        mat4 projection;
+        mat4 view;
+    } window;
+
+    void main()
+    {
+        gl_Position = window.projection * window.view * vec4(position, 0.0, 1.0);
+        gl_PointSize = point_size;
+        vertex_colors = colors;
+    }
+"""
+
+node_fragment_source = """#version 150 core
+    in vec4 vertex_colors;
+    out vec4 final_color;
+
+    void main()
+    {
+        if (length(gl_PointCoord - vec2(0.5)) > 0.5)
+            discard;
+        final_color = vertex_colors;
+    }
+"""
+
+EDGE_COLOR = (128, 128, 128, 255)
+ARROW_COLOR = (0, 0, 0, 255)
+NODE_COLOR = (0, 0, 255, 255)
+EDGE_THICKNESS = 4
+ARROW_SIZE = 10
+NODE_RADIUS = 5
+DASH_LENGTH = 10
+GAP_LENGTH = 10
+CULL_MARGIN = 2 * ARROW_SIZE
+TILE_CACHE_SIZE = 256
+
+
+def get_shape_program():
+    return pyglet.gl.current_context.create_program((shape_vertex_source, 'vertex'),
+                                                    (shape_fragment_source, 'fragment'))
+
+
+def get_dash_program():
+    return pyglet.gl.current_context.create_program((dash_vertex_source, 'vertex'),
+                                                    (dash_fragment_source, 'fragment'))
+
+
+def get_node_program():
+    return pyglet.gl.current_context.create_program((node_vertex_source, 'vertex'),
+                                                    (node_fragment_source, 'fragment'))
+
+
+def get_vehicle_program():
+    return pyglet.gl.current_context.create_program((node_vertex_source, 'vertex'),
+                                                    (shape_fragment_source, 'fragment'))
+
+
+class MapGroup(Group):
+    def __init__(self, program, order=0, parent=None):
+        super().__init__(order=order, parent=parent)
+        self.program = program
+
+    def set_state(self):
+        self.program.bind()
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+    def unset_state(self):
+        glDisable(GL_BLEND)
+        self.program.unbind()
+
+    def __eq__(self, other):
+        return (self.__class__ is other.__class__ and
+                self.program == other.program and
+                self.order == other.order and
+                self.parent == other.parent)
+
+    def __hash__(self):
+        return hash((self.program, self.order, self.parent))
+
+
+class NodeGroup(MapGroup):
+    def __init__(self, program, point_size, order=0, parent=None):
+        super().__init__(program, order=order, parent=parent)
+        self.point_size = point_size
+
+    def set_state(self):
+        super().set_state()
+        glEnable(GL_PROGRAM_POINT_SIZE)
+        self.program['point_size'] = self.point_size
+
+    def unset_state(self):
+        glDisable(GL_PROGRAM_POINT_SIZE)
+        super().unset_state()
+
+
+class DashGroup(MapGroup):
+    def __init__(self, program, dash_length, gap_length, order=0, parent=None):
+        super().__init__(program, order=order, parent=parent)
+        self.dash_length = dash_length
+        self.gap_length = gap_length
+
+    def set_state(self):
+        super().set_state()
+        self.program['dash_length'] = self.dash_length
+        self.program['gap_length'] = self.gap_length
+
+
+class ChunkGroup(Group):
+    # Carries no GL state of its own, it only lets one cell of the map be
+    # hidden while the parent layer group binds the shader once.
+    def __init__(self, key, parent):
+        super().__init__(parent=parent)
+        self.key = key
+
+    def __eq__(self, other):
+        return self.__class__ is other.__class__ and self.key == other.key and self.parent == other.parent
+
+    def __hash__(self):
+        return hash((self.key, self.parent))
+
+
+def upload(vertex_list, name, data):
+    # Reading the attribute marks the region dirty, so writing straight into
+    # the returned ctypes array is enough for the batch to re-upload it.
+    np.ctypeslib.as_array(getattr(vertex_list, name))[:] = np.ravel(data)
+
+
+def edge_quads(x1, y1, x2, y2, thickness=EDGE_THICKNESS):
+    dx, dy = x2 - x1, y2 - y1
+    length = np.hypot(dx, dy)
+    safe_length = np.where(length > 0, length, 1.0)
+    nx = -dy / safe_length * thickness / 2
+    ny = dx / safe_length * thickness / 2
+
+    positions = np.empty((len(x1), 6, 2), dtype=np.float32)
+    offsets = np.empty((len(x1), 6, 2), dtype=np.float32)
+    for vertex, (px, py, side) in enumerate([(x1, y1, 1), (x2, y2, 1), (x2, y2, -1),
+                                             (x1, y1, 1), (x2, y2, -1), (x1, y1, -1)]):
+        positions[:, vertex, 0] = px
+        positions[:, vertex, 1] = py
+        offsets[:, vertex, 0] = nx * side
+        offsets[:, vertex, 1] = ny * side
+    return positions.reshape(-1, 2), offsets.reshape(-1, 2)
+
+
+def arrow_triangles(x1, y1, x2, y2, size=ARROW_SIZE):
+    dx, dy = x2 - x1, y2 - y1
+    length = np.hypot(dx, dy)
+    keep = length > 0
+    x1, y1, x2, y2 = x1[keep], y1[keep], x2[keep], y2[keep]
+    nx, ny = dx[keep] / length[keep], dy[keep] / length[keep]
+
+    positions = np.empty((len(x1), 3, 2), dtype=np.float32)
+    positions[:, :, 0] = ((x1 + x2) / 2)[:, None]
+    positions[:, :, 1] = ((y1 + y2) / 2)[:, None]
+
+    offsets = np.zeros((len(x1), 3, 2), dtype=np.float32)
+    offsets[:, 1, 0] = -nx * size - ny * size / 2
+    offsets[:, 1, 1] = -ny * size + nx * size / 2
+    offsets[:, 2, 0] = -nx * size + ny * size / 2
+    offsets[:, 2, 1] = -ny * size - nx * size / 2
+    return positions.reshape(-1, 2), offsets.reshape(-1, 2)
+
+
+def edge_distances(x1, y1, x2, y2):
+    # Distance from the edge start of every vertex made by edge_quads.
+    length = np.hypot(x2 - x1, y2 - y1).astype(np.float32)
+    return np.outer(length, np.array([0, 1, 1, 0, 1, 0], dtype=np.float32)).ravel()
+
+
+def shape_vertex_list(program, positions, offsets, color, batch, group):
+    vertex_list = program.vertex_list(len(positions), GL_TRIANGLES, batch=batch, group=group,
+                                      position='f', offset='f', colors='Bn')
+    upload(vertex_list, 'position', positions)
+    upload(vertex_list, 'offset', offsets)
+    upload(vertex_list, 'colors', np.tile(np.array(color, dtype=np.uint8), len(positions)))
+    return vertex_list
+
+
+def dash_vertex_list(program, positions, offsets, distances, color, batch, group):
+    vertex_list = program.vertex_list(len(positions), GL_TRIANGLES, batch=batch, group=group,
+                                      position='f', offset='f', colors='Bn', distance='f')
+    upload(vertex_list, 'position', positions)
+    upload(vertex_list, 'offset', offsets)
+    upload(vertex_list, 'colors', np.tile(np.array(color, dtype=np.uint8), len(positions)))
+    upload(vertex_list, 'distance', distances)
+    return vertex_list
+
+
+def node_vertex_list(program, xs, ys, color, batch, group):
+    vertex_list = program.vertex_list(len(xs), GL_POINTS, batch=batch, group=group,
+                                      position='f', colors='Bn')
+    upload(vertex_list, 'position', np.column_stack([xs, ys]).astype(np.float32))
+    upload(vertex_list, 'colors', np.tile(np.array(color, dtype=np.uint8), len(xs)))
+    return vertex_list
+
+
+class MapChunk:
+    def __init__(self, key, edge_layer, dash_layer, arrow_layer, node_layer):
+        self.edge_group = ChunkGroup(key, edge_layer)
+        self.dash_group = ChunkGroup(key, dash_layer)
+        self.arrow_group = ChunkGroup(key, arrow_layer)
+        self.node_group = ChunkGroup(key, node_layer)
+        self.vertex_lists = []
+        self._visible = True
+
+    @property
+    def visible(self):
+        return self._visible
+
+    @visible.setter
+    def visible(self, value):
+        self._visible = value
+        self.edge_group.visible = value
+        self.dash_group.visible = value
+        self.arrow_group.visible = value
+        self.node_group.visible = value
+
+    def delete(self):
+        for vertex_list in self.vertex_lists:
+            vertex_list.delete()
+        self.vertex_lists = []
+
+
+class MapGeometry:
+    def __init__(self, graph, batch, spatial_index):
+        self.shape_program = get_shape_program()
+        self.dash_program = get_dash_program()
+        self.node_program = get_node_program()
+        self.edge_layer = MapGroup(self.shape_program, order=0)
+        self.dash_layer = DashGroup(self.dash_program, DASH_LENGTH, GAP_LENGTH, order=0)
+        self.arrow_layer = MapGroup(self.shape_program, order=1)
+        self.node_layer = NodeGroup(self.node_program, NODE_RADIUS * 2, order=2)
+        self.batch = batch
+        self.spatial_index = spatial_index
+        self.chunks = {}
+
+        # Every element lives in the chunk of the grid cell holding its
+        # midpoint; edges longer than a cell go to the always visible
+        # chunk None, so a chunk never reaches further than half a cell.
+        x1, y1 = graph.xs[graph.edge_start], graph.ys[graph.edge_start]
+        x2, y2 = graph.xs[graph.edge_end], graph.ys[graph.edge_end]
+        cell_size = spatial_index.cell_size
+        oversized = np.hypot(x2 - x1, y2 - y1) > cell_size
+        edge_cells = np.column_stack([np.floor((x1 + x2) / 2 / cell_size),
+                                      np.floor((y1 + y2) / 2 / cell_size)]).astype(np.int64)
+        node_cells = np.column_stack([np.floor(graph.xs / cell_size),
+                                      np.floor(graph.ys / cell_size)]).astype(np.int64)
+
+        for key, edge_ids in self._split_by_cell(edge_cells, ~oversized):
+            self._add_edges(key, x1[edge_ids], y1[edge_ids], x2[edge_ids], y2[edge_ids],
+                            graph.edge_dashed[edge_ids])
+        if oversized.any():
+            self._add_edges(None, x1[oversized], y1[oversized], x2[oversized], y2[oversized],
+                            graph.edge_dashed[oversized])
+        for key, node_ids in self._split_by_cell(node_cells, np.ones(graph.node_count, dtype=np.bool_)):
+            chunk = self._chunk(key)
+            chunk.vertex_lists.append(node_vertex_list(self.node_program, graph.xs[node_ids], graph.ys[node_ids],
+                                                       NODE_COLOR, batch, chunk.node_group))
+
+        self.visible_keys = set(self.chunks)
+
+    def _split_by_cell(self, cells, mask):
+        ids = np.flatnonzero(mask)
+        if len(ids) == 0:
+            return
+        keys, inverse = np.unique(cells[ids], axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+        for k, (cell_x, cell_y) in enumerate(keys.tolist()):
+            yield (cell_x, cell_y), ids[order[bounds[k]:bounds[k + 1]]]
+
+    def _chunk(self, key):
+        if key not in self.chunks:
+            self.chunks[key] = MapChunk(key, self.edge_layer, self.dash_layer, self.arrow_layer, self.node_layer)
+        return self.chunks[key]
+
+    def _add_edges(self, key, x1, y1, x2, y2, dashed):
+        chunk = self._chunk(key)
+        solid = ~dashed
+        if solid.any():
+            positions, offsets = edge_quads(x1[solid], y1[solid], x2[solid], y2[solid])
+            chunk.vertex_lists.append(shape_vertex_list(self.shape_program, positions, offsets, EDGE_COLOR,
+                                                        self.batch, chunk.edge_group))
+
+        positions, offsets = arrow_triangles(x1, y1, x2, y2)
+        if len(positions):
+            chunk.vertex_lists.append(shape_vertex_list(self.shape_program, positions, offsets, ARROW_COLOR,
+                                                        self.batch, chunk.arrow_group))
+
+        if dashed.any():
+            edges = (x1[dashed], y1[dashed], x2[dashed], y2[dashed])
+            positions, offsets = edge_quads(*edges)
+            chunk.vertex_lists.append(dash_vertex_list(self.dash_program, positions, offsets, edge_distances(*edges),
+                                                       EDGE_COLOR, self.batch, chunk.dash_group))
+
+    def show_cells(self, cells):
+        visible_keys = {key for key in cells if key in self.chunks}
+        visible_keys.add(None)
+        for key in self.visible_keys - visible_keys:
+            self.chunks[key].visible = False
+        for key in visible_keys - self.visible_keys:
+            if key in self.chunks:
+                self.chunks[key].visible = True
+        self.visible_keys = visible_keys
+
+    def delete(self):
+        for chunk in self.chunks.values():
+            chunk.delete()
+        self.chunks = {}
+
+
+class FleetMarkers:
+    # Every vehicle is a single point drawn as a square sprite, so the whole
+    # fleet is one vertex list updated with one upload per frame.
+    def __init__(self, batch, size, color, order=3):
+        self.program = get_vehicle_program()
+        self.group = NodeGroup(self.program, size, order=order)
+        self.group.visible = False
+        self.color = np.array(color, dtype=np.uint8)
+        self.batch = batch
+        self.vertex_list = None
+
+    def set_positions(self, xs, ys):
+        count = len(xs)
+        self.group.visible = count > 0
+        if count == 0:
+            return
+        if self.vertex_list is None:
+            self.vertex_list = self.program.vertex_list(count, GL_POINTS, batch=self.batch, group=self.group,
+                                                        position='f', colors='Bn')
+            upload(self.vertex_list, 'colors', np.tile(self.color, count))
+        elif self.vertex_list.count != count:
+            self.vertex_list.resize(count)
+            upload(self.vertex_list, 'colors', np.tile(self.color, count))
+        upload(self.vertex_list, 'position', np.column_stack([xs, ys]).astype(np.float32))
+
+    def delete(self):
+        if self.vertex_list is not None:
+            self.vertex_list.delete()
+            self.vertex_list = None
+
+
+class TileBackground:
+    # One sprite per background tile under the viewport, at the pyramid level
+    # matching the zoom. Image rows run down while the viewer's y axis runs
+    # up, like the map coordinates, so tiles are drawn flipped to line up.
+    def __init__(self, pyramid, batch, cache_size=TILE_CACHE_SIZE):
+        self.pyramid = pyramid
+        self.batch = batch
+        self.cache = TileCache(lambda key: pyglet.image.load(pyramid.tile_path(*key)).get_texture(), cache_size)
+        self.sprites = {}
+
+    def show(self, left, bottom, right, top, zoom):
+        level = self.pyramid.level_for(zoom)
+        keys = set(self.pyramid.tiles_in_rect(level, left, bottom, right, top))
+        for key in list(self.sprites):
+            if key not in keys:
+                self.sprites.pop(key).delete()
+        for key in keys - self.sprites.keys():
+            x, y, _, height = self.pyramid.tile_rect(*key)
+            factor = 2 ** key[0]
+            sprite = pyglet.sprite.Sprite(self.cache.get(key), x, y + height, batch=self.batch)
+            sprite.update(scale_x=factor, scale_y=-factor)
+            self.sprites[key] = sprite
+
+    def delete(self):
+        for sprite in self.sprites.values():
+            sprite.delete()
+        self.sprites = {}
@@ -0,0 +1,67 @@
+import json
+import socket
+import sys
+
+# Only the standard library is imported here, so a query costs a process
+# start and a round trip to route_server.py, not loading the map.
+DEFAULT_SOCKET = "routing.sock"
+ARGUMENTS = {"route": ("start", "end"), "distance": ("start", "end"), "nearest": ("x", "y"), "info": ()}
+
+
+def parse_queries(words):
+    queries = []
+    i = 0
+    while i < len(words):
+        op = words[i]
+        if op not in ARGUMENTS:
+            raise ValueError(f"Unknown query {op}")
+        names = ARGUMENTS[op]
+        values = words[i + 1:i + 1 + len(names)]
+        if len(values) < len(names):
+            raise ValueError(f"{op} needs {' and '.join(names)}")
+        convert = float if op == "nearest" else int
+        queries.append({"op": op, **{name: convert(value) for name, value in zip(names, values)}})
+        i += 1 + len(names)
+    return queries
+
+
+def request(queries, socket_path=DEFAULT_SOCKET, port=None):
+    if port is None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(socket_path)
+    else:
+        connection = socket.create_connection(("127.0.0.1", port))
+
+    with connection:
+        connection.sendall((json.dumps(queries) + "\n").encode())
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = connection.recv(1 << 16)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data)
+
+
+if __name__ == "__main__":
+    words = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--") and "=" in arg)
+    try:
+        queries = parse_queries(words)
+    except ValueError as e:
+        print(str(e))
+        queries = []
+    if not queries:
+        print("Usage: python route_client.py <query>... [--socket=PATH] [--port=N]")
+        print("Queries: route START END, distance START END, nearest X Y, info")
+        sys.exit(1)
+
+    socket_path = options.get("socket", DEFAULT_SOCKET)
+    port = int(options["port"]) if "port" in options else None
+    try:
+        answers = request(queries, socket_path, port)
+    except (ConnectionError, FileNotFoundError) as e:
+        print(f"Routing server is not reachable at {socket_path if port is None else port}: {str(e)}")
+        sys.exit(1)
+    for answer in answers:
+        print(json.dumps(answer))
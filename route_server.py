@@ -0,0 +1,210 @@
+import asyncio
+import json
+import math
+import os
+import stat
+import sys
+
+import map_loader
+from od_matrix import one_to_many
+from routing import Router
+from spatial import SpatialGrid
+
+DEFAULT_SOCKET = "routing.sock"
+# Batches go over one line, so a line may be much longer than the asyncio
+# default of 64 KiB.
+LINE_LIMIT = 1 << 24
+
+
+class RoutingService:
+    # Keeps one map loaded together with its router and spatial index, and
+    # reloads it when the file changes. Queries that arrive while a batch is
+    # being answered are gathered into the next batch.
+    def __init__(self, map_path, landmarks=0, reload_interval=1.0, contract=False):
+        self.map_path = map_path
+        self.landmarks = landmarks
+        self.contract = contract
+        self.reload_interval = reload_interval
+        self.failed_mtime = None
+        self.pending = None
+        self.batches = 0
+        self.queries = 0
+        self._install(self._build())
+
+    def _build(self):
+        mtime = os.stat(self.map_path).st_mtime_ns
+        graph = map_loader.load_map(self.map_path)
+        router = Router(graph, self.map_path, landmark_count=self.landmarks, contract=self.contract)
+        return mtime, graph, router, SpatialGrid.from_graph(graph)
+
+    def _install(self, state):
+        self.mtime, self.graph, self.router, self.spatial_index = state
+        print(f"Loaded {self.graph.node_count} points and {self.graph.edge_count} connections from {self.map_path}")
+
+    async def watch(self):
+        # The map is rebuilt in a thread; queries keep being answered from
+        # the old one until the new one is complete.
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            mtime = None
+            try:
+                mtime = os.stat(self.map_path).st_mtime_ns
+                if mtime in (self.mtime, self.failed_mtime):
+                    continue
+                self._install(await asyncio.to_thread(self._build))
+            except Exception as e:
+                self.failed_mtime = mtime
+                print(f"Reloading {self.map_path} failed, keeping the loaded map: {str(e)}")
+
+    async def submit(self, queries):
+        future = asyncio.get_running_loop().create_future()
+        await self.pending.put((queries, future))
+        return await future
+
+    async def batch_worker(self):
+        while True:
+            requests = [await self.pending.get()]
+            while not self.pending.empty():
+                requests.append(self.pending.get_nowait())
+            queries = [query for request, _ in requests for query in request]
+            # A query that fails in an unexpected way fails its batch, never
+            # the worker every client depends on.
+            try:
+                answers = await asyncio.to_thread(self.answer, queries)
+            except Exception as e:
+                print(f"Answering a batch of {len(queries)} queries failed: {str(e)}")
+                answers = [{"error": f"Internal error: {str(e)}"}] * len(queries)
+            self.batches += 1
+            self.queries += len(queries)
+
+            offset = 0
+            for request, future in requests:
+                if not future.done():
+                    future.set_result(answers[offset:offset + len(request)])
+                offset += len(request)
+
+    def answer(self, queries):
+        graph, router, spatial_index = self.graph, self.router, self.spatial_index
+        answers = [None] * len(queries)
+        by_start = {}
+        for i, query in enumerate(queries):
+            if not isinstance(query, dict):
+                answers[i] = {"error": "Expected a query object"}
+                continue
+            try:
+                op = query.get("op")
+                if op in ("route", "distance"):
+                    start, end = self._node(graph, query["start"]), self._node(graph, query["end"])
+                    by_start.setdefault(start, []).append((i, op, end))
+                elif op == "nearest":
+                    answers[i] = self._nearest(graph, spatial_index, float(query["x"]), float(query["y"]))
+                elif op == "info":
+                    answers[i] = {"map": self.map_path, "nodes": graph.node_count, "edges": graph.edge_count,
+                                  "batches": self.batches, "queries": self.queries,
+                                  "cache_hits": router.hits, "cache_misses": router.misses}
+                else:
+                    answers[i] = {"error": f"Unknown op {op}"}
+            except KeyError as e:
+                answers[i] = {"error": f"Missing field {e}"}
+            except (TypeError, ValueError, OverflowError) as e:
+                answers[i] = {"error": str(e)}
+
+        indptr, indices, weights, _, _ = graph._adjacency_lists()
+        for start, wanted in by_start.items():
+            # Queries sharing a start are answered by one search that stops
+            # once all their ends are settled.
+            if len(wanted) > 1:
+                distances, paths = one_to_many(indptr, indices, weights, start, [end for _, _, end in wanted], True)
+            else:
+                path = router.route(start, wanted[0][2])
+                distances, paths = [graph.path_length(path) if path else math.inf], [path]
+
+            for (i, op, _), distance, path in zip(wanted, distances, paths):
+                distance = distance if distance < math.inf else None
+                answers[i] = {"path": path, "distance": distance} if op == "route" else {"distance": distance}
+        return answers
+
+    def _node(self, graph, value):
+        # JSON numbers like 2.9 or 1e400 and booleans are refused rather
+        # than truncated or converted into some node.
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError(f"Node ids must be integers, got {json.dumps(value)}")
+        node = value
+        if not 0 <= node < graph.node_count:
+            raise ValueError(f"Unknown node {value}")
+        return node
+
+    def _nearest(self, graph, spatial_index, x, y):
+        if not (math.isfinite(x) and math.isfinite(y)):
+            raise ValueError("Coordinates must be finite numbers")
+        if graph.node_count == 0:
+            return {"node": None}
+        radius = spatial_index.cell_size
+        node = spatial_index.nearest_point(x, y, radius)
+        while node is None:
+            radius *= 2
+            node = spatial_index.nearest_point(x, y, radius)
+        node_x, node_y = spatial_index.points[node]
+        return {"node": node, "x": node_x, "y": node_y, "distance": math.hypot(node_x - x, node_y - y)}
+
+    async def handle(self, reader, writer):
+        # One JSON value per line: a query object gets one answer object, a
+        # list of queries gets the list of their answers.
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    response = {"error": "Invalid JSON"}
+                else:
+                    if isinstance(request, dict):
+                        response = (await self.submit([request]))[0]
+                    elif isinstance(request, list):
+                        response = await self.submit(request)
+                    else:
+                        response = {"error": "Expected a query or a list of queries"}
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path=DEFAULT_SOCKET, port=None):
+        self.pending = asyncio.Queue()
+        if port is not None:
+            server = await asyncio.start_server(self.handle, "127.0.0.1", port, limit=LINE_LIMIT)
+            print(f"Listening on 127.0.0.1:{port}")
+        else:
+            if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                os.remove(socket_path)
+            server = await asyncio.start_unix_server(self.handle, socket_path, limit=LINE_LIMIT)
+            print(f"Listening on {socket_path}")
+
+        tasks = [asyncio.create_task(self.batch_worker()), asyncio.create_task(self.watch())]
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            if port is None and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--") and "=" in arg)
+    if not args:
+        print("Usage: python route_server.py <map> [--socket=PATH] [--port=N] [--landmarks=N] [--reload-interval=S] "
+              "[--contract]")
+        sys.exit(1)
+
+    service = RoutingService(args[0], landmarks=int(options.get("landmarks", 0)),
+                             reload_interval=float(options.get("reload-interval", 1.0)),
+                             contract="--contract" in sys.argv)
+    try:
+        asyncio.run(service.serve(options.get("socket", DEFAULT_SOCKET),
+                                  int(options["port"]) if "port" in options else None))
+    except KeyboardInterrupt:
+        print("Routing server stopped")
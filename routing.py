@@ -0,0 +1,192 @@
+import hashlib
+import heapq
+import math
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from contraction import ContractedGraph
+
+LANDMARK_SUFFIX = ".landmarks.npz"
+
+
+def graph_fingerprint(graph):
+    digest = hashlib.sha1()
+    for array in (graph.xs, graph.ys, graph.edge_start, graph.edge_end, graph.edge_length):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+class Landmarks:
+    # ALT preprocessing: exact distances from a few landmarks to every node.
+    # By the triangle inequality |d(l, t) - d(l, v)| never overestimates the
+    # distance from v to t, which makes it an admissible A* heuristic.
+    def __init__(self, nodes, distances, fingerprint, requested):
+        self.nodes = np.asarray(nodes, dtype=np.int64)
+        self.distances = np.asarray(distances, dtype=np.float64)
+        self.fingerprint = fingerprint
+        self.requested = requested
+        self._rows = None
+
+    @classmethod
+    def build(cls, graph, count):
+        nodes, rows = [], []
+        if graph.node_count:
+            # Farthest selection: each landmark is the reachable node furthest
+            # from the ones picked so far, starting from the best connected.
+            closest = np.full(graph.node_count, np.inf)
+            candidate = int(np.argmax(np.diff(graph.indptr)))
+            for _ in range(min(count, graph.node_count)):
+                distances = np.array(graph.distances_from(candidate)[0])
+                nodes.append(candidate)
+                rows.append(distances)
+                closest = np.minimum(closest, distances)
+                reachable = np.isfinite(closest)
+                reachable[nodes] = False
+                if not reachable.any():
+                    break
+                candidate = int(np.argmax(np.where(reachable, closest, -1.0)))
+        distances = np.array(rows).reshape(len(rows), graph.node_count)
+        return cls(nodes, distances, graph_fingerprint(graph), count)
+
+    def save(self, path):
+        with open(path, "wb") as landmark_file:
+            np.savez(landmark_file, nodes=self.nodes, distances=self.distances,
+                     fingerprint=np.array(self.fingerprint), requested=self.requested)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["nodes"], data["distances"], str(data["fingerprint"]), int(data["requested"]))
+
+    def _landmark_rows(self):
+        if self._rows is None:
+            self._rows = self.distances.tolist()
+        return self._rows
+
+    def search(self, graph, start, end):
+        indptr, indices, weights, _, _ = graph._adjacency_lists()
+        rows = self._landmark_rows()
+        targets = [row[end] for row in rows]
+
+        def estimate(node_id):
+            best = 0.0
+            for row, target_distance in zip(rows, targets):
+                distance = row[node_id]
+                if distance != target_distance:
+                    # A landmark that reaches only one of the two nodes proves
+                    # they lie in different components: the gap is infinite.
+                    gap = abs(target_distance - distance)
+                    if gap > best:
+                        best = gap
+            return best
+
+        if estimate(start) == math.inf:
+            return []
+        distances = {start: 0.0}
+        previous = {}
+        # Ties on the estimate go to the node furthest along; on grid-like
+        # maps whole regions share one estimate and would all be expanded.
+        unvisited = [(estimate(start), -0.0, start)]
+
+        while unvisited:
+            _, current_distance, current_id = heapq.heappop(unvisited)
+            current_distance = -current_distance
+            if current_id == end:
+                path = [end]
+                while path[-1] != start:
+                    path.append(previous[path[-1]])
+                return path[::-1]
+            if current_distance > distances[current_id]:
+                continue
+
+            for k in range(indptr[current_id], indptr[current_id + 1]):
+                neighbor_id = indices[k]
+                distance = current_distance + weights[k]
+                if distance < distances.get(neighbor_id, math.inf):
+                    distances[neighbor_id] = distance
+                    previous[neighbor_id] = current_id
+                    heapq.heappush(unvisited, (distance + estimate(neighbor_id), -distance, neighbor_id))
+
+        return []
+
+
+class Router:
+    def __init__(self, graph, map_path=None, cache_size=4096, landmark_count=0, contract=False):
+        self.map_path = map_path
+        self.cache_size = cache_size
+        self.landmark_count = landmark_count
+        self.contract = contract
+        self.use_astar = True
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.landmarks = None
+        self.contracted = None
+        self.set_graph(graph)
+
+    def set_graph(self, graph):
+        # Cached paths and landmark distances only hold for the graph they
+        # were computed on.
+        self.graph = graph
+        self.cache.clear()
+        self.landmarks = None
+        self.contracted = None
+        # Searching the contracted graph replaces the landmarks, which would
+        # have to be computed on it instead.
+        if self.contract:
+            self.contracted = ContractedGraph(graph)
+        elif self.landmark_count > 0:
+            self.prepare()
+
+    def landmark_path(self):
+        return self.map_path + LANDMARK_SUFFIX if self.map_path else None
+
+    def prepare(self):
+        fingerprint = graph_fingerprint(self.graph)
+        path = self.landmark_path()
+        if path and os.path.exists(path):
+            try:
+                landmarks = Landmarks.load(path)
+                if landmarks.fingerprint == fingerprint and landmarks.requested >= self.landmark_count:
+                    self.landmarks = landmarks
+                    return
+            except Exception as e:
+                print(f"Ignoring landmark file {path}: {str(e)}")
+
+        self.landmarks = Landmarks.build(self.graph, self.landmark_count)
+        if path:
+            try:
+                self.landmarks.save(path)
+                print(f"Saved {len(self.landmarks.nodes)} landmarks to {path}")
+            except OSError as e:
+                print(f"Could not save landmarks to {path}: {str(e)}")
+
+    def route(self, start, end):
+        key = (start, end)
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return list(self.cache[key])
+        # Edges are undirected, so the path back is the same one reversed.
+        if (end, start) in self.cache:
+            self.hits += 1
+            self.cache.move_to_end((end, start))
+            return list(self.cache[(end, start)][::-1])
+
+        self.misses += 1
+        path = self._search(start, end)
+        self.cache[key] = tuple(path)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return path
+
+    def _search(self, start, end):
+        if self.contracted is not None:
+            return self.contracted.route(start, end)
+        if self.landmarks is not None:
+            return self.landmarks.search(self.graph, start, end)
+        if self.use_astar:
+            return self.graph.astar(start, end)
+        return self.graph.shortest_path(start, end)
@@ -0,0 +1,150 @@
+import heapq
+import itertools
+from collections import deque
+
+import numpy as np
+
+
+class EventFleet:
+    # Discrete-event counterpart of fleet.Fleet with the same interface. An
+    # agent only costs work when it reaches a node: its next arrival goes on
+    # a heap and positions are interpolated from departure and arrival times
+    # when a frame asks for them. With a vehicle spacing, a segment holds at
+    # most length // spacing agents one way and the rest queue at the node
+    # before it in arrival order.
+    def __init__(self, xs, ys, vehicle_spacing=None):
+        if vehicle_spacing is not None and not vehicle_spacing > 0:
+            raise ValueError(f"Vehicle spacing must be positive, got {vehicle_spacing}")
+        self.xs = np.asarray(xs, dtype=np.float64)
+        self.ys = np.asarray(ys, dtype=np.float64)
+        self.vehicle_spacing = vehicle_spacing
+        self.time = 0.0
+        self.events = []
+        self.sequence = itertools.count()
+        self.arrivals = 0
+        self.occupancy = {}
+        self.queues = {}
+
+        self.route_nodes = []
+        self.segment_lengths = []
+        self.route_start = []
+        self.route_size = []
+        self.segment = []
+        self.direction = []
+        self.speed = []
+        self.current = []
+
+        self.from_node = np.zeros(0, dtype=np.int64)
+        self.to_node = np.zeros(0, dtype=np.int64)
+        self.depart = np.zeros(0, dtype=np.float64)
+        self.arrive = np.zeros(0, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.route_start)
+
+    def add_agents(self, routes, speeds):
+        routes = [[int(node) for node in route] for route in routes]
+        if any(not route for route in routes):
+            raise ValueError("Every route needs at least one node")
+        speeds = np.broadcast_to(np.asarray(speeds, dtype=np.float64), len(routes)).tolist()
+
+        first = len(self)
+        self.from_node = np.concatenate([self.from_node, np.zeros(len(routes), dtype=np.int64)])
+        self.to_node = np.concatenate([self.to_node, np.zeros(len(routes), dtype=np.int64)])
+        self.depart = np.concatenate([self.depart, np.full(len(routes), self.time)])
+        self.arrive = np.concatenate([self.arrive, np.full(len(routes), self.time)])
+
+        xs, ys = self.xs, self.ys
+        for agent, (route, speed) in enumerate(zip(routes, speeds), first):
+            # segment_lengths[k] is the length from route_nodes[k] to the
+            # next node, zero in the slot of each route's last node.
+            lengths = np.hypot(np.diff(xs[route]), np.diff(ys[route])).tolist() + [0.0]
+            self.route_start.append(len(self.route_nodes))
+            self.route_size.append(len(route))
+            self.route_nodes.extend(route)
+            self.segment_lengths.extend(lengths)
+            self.segment.append(0)
+            self.direction.append(1)
+            self.speed.append(speed)
+            self.current.append(None)
+
+            self.from_node[agent] = self.to_node[agent] = route[0]
+            # A route of a single node or of coincident nodes only has a
+            # position and never produces an event.
+            if len(route) > 1 and sum(lengths) > 0:
+                self._enter(agent, self.time)
+        return np.arange(first, len(self))
+
+    def clear(self):
+        self.__init__(self.xs, self.ys, self.vehicle_spacing)
+
+    def _current_segment(self, agent):
+        k = self.route_start[agent] + self.segment[agent]
+        if self.direction[agent] > 0:
+            return self.route_nodes[k], self.route_nodes[k + 1], self.segment_lengths[k]
+        return self.route_nodes[k + 1], self.route_nodes[k], self.segment_lengths[k]
+
+    def _capacity(self, length):
+        if self.vehicle_spacing is None:
+            return None
+        return max(int(length // self.vehicle_spacing), 1)
+
+    def _enter(self, agent, time):
+        start, end, length = self._current_segment(agent)
+        key = (start, end)
+        self.current[agent] = (key, length)
+        self.from_node[agent] = start
+        self.to_node[agent] = end
+        capacity = self._capacity(length)
+        if capacity is not None and (self.occupancy.get(key, 0) >= capacity or key in self.queues):
+            if key not in self.queues:
+                self.queues[key] = deque()
+            self.queues[key].append(agent)
+            self.depart[agent] = self.arrive[agent] = time
+            return
+        self._depart(agent, key, length, time)
+
+    def _depart(self, agent, key, length, time):
+        self.occupancy[key] = self.occupancy.get(key, 0) + 1
+        arrival = time + length / self.speed[agent]
+        self.depart[agent] = time
+        self.arrive[agent] = arrival
+        heapq.heappush(self.events, (arrival, next(self.sequence), agent))
+
+    def _arrive(self, agent, time):
+        self.arrivals += 1
+        key = self.current[agent][0]
+        self.occupancy[key] -= 1
+        queue = self.queues.get(key)
+        if queue:
+            waiting = queue.popleft()
+            if not queue:
+                del self.queues[key]
+            self._depart(waiting, key, self.current[waiting][1], time)
+
+        # Drive the route forth and back, like Fleet.
+        self.segment[agent] += self.direction[agent]
+        if not 0 <= self.segment[agent] <= self.route_size[agent] - 2:
+            self.direction[agent] = -self.direction[agent]
+            self.segment[agent] += self.direction[agent]
+        self._enter(agent, time)
+
+    def update(self, dt):
+        self.time += dt
+        events = self.events
+        while events and events[0][0] <= self.time:
+            arrival, _, agent = heapq.heappop(events)
+            self._arrive(agent, arrival)
+
+    def queued(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def positions(self):
+        if not len(self):
+            return np.zeros(0), np.zeros(0)
+        span = self.arrive - self.depart
+        ratio = np.divide(self.time - self.depart, span, out=np.zeros(len(self)), where=span > 0)
+        np.clip(ratio, 0.0, 1.0, out=ratio)
+        start, end = self.from_node, self.to_node
+        return (self.xs[start] + (self.xs[end] - self.xs[start]) * ratio,
+                self.ys[start] + (self.ys[end] - self.ys[start]) * ratio)
@@ -0,0 +1,189 @@
+import math
+
+import numpy as np
+
+
+class SpatialGrid:
+    def __init__(self, cell_size=50.0):
+        self.cell_size = float(cell_size)
+        self.point_cells = {}
+        self.points = {}
+        self.edge_cells = {}
+        self.edges = {}
+        self.bounds = None
+
+    @classmethod
+    def from_graph(cls, graph, cell_size=None, max_cells=32, points=True, edges=False):
+        # Only the tables a caller looks things up in are filled: the viewer
+        # culls whole cells and needs neither, the route server needs points.
+        if cell_size is None:
+            cell_size = 1.0
+            if graph.node_count:
+                extent = max(np.ptp(graph.xs), np.ptp(graph.ys))
+                cell_size = max(extent / max_cells, 1.0)
+
+        grid = cls(cell_size)
+        if not graph.node_count:
+            return grid
+        cell_xs = np.floor(graph.xs / grid.cell_size).astype(np.int64)
+        cell_ys = np.floor(graph.ys / grid.cell_size).astype(np.int64)
+        grid.bounds = [int(cell_xs.min()), int(cell_ys.min()), int(cell_xs.max()), int(cell_ys.max())]
+
+        if points:
+            grid.points = dict(enumerate(zip(graph.xs.tolist(), graph.ys.tolist())))
+            keys, inverse = np.unique(np.column_stack([cell_xs, cell_ys]), axis=0, return_inverse=True)
+            inverse = inverse.ravel()
+            order = np.argsort(inverse, kind="stable")
+            starts = np.searchsorted(inverse[order], np.arange(len(keys) + 1)).tolist()
+            order = order.tolist()
+            grid.point_cells = {(cell_x, cell_y): set(order[starts[k]:starts[k + 1]])
+                                for k, (cell_x, cell_y) in enumerate(keys.tolist())}
+
+        if edges:
+            xs, ys = graph.xs.tolist(), graph.ys.tolist()
+            for edge_id, (start, end) in enumerate(zip(graph.edge_start.tolist(), graph.edge_end.tolist())):
+                grid.insert_edge(edge_id, xs[start], ys[start], xs[end], ys[end])
+        return grid
+
+    def cell_of(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _grow_bounds(self, cell):
+        if self.bounds is None:
+            self.bounds = [cell[0], cell[1], cell[0], cell[1]]
+        else:
+            self.bounds[0] = min(self.bounds[0], cell[0])
+            self.bounds[1] = min(self.bounds[1], cell[1])
+            self.bounds[2] = max(self.bounds[2], cell[0])
+            self.bounds[3] = max(self.bounds[3], cell[1])
+
+    def cells_in_rect(self, x0, y0, x1, y1):
+        if self.bounds is None:
+            return
+        min_x, min_y = self.cell_of(min(x0, x1), min(y0, y1))
+        max_x, max_y = self.cell_of(max(x0, x1), max(y0, y1))
+        min_x, min_y = max(min_x, self.bounds[0]), max(min_y, self.bounds[1])
+        max_x, max_y = min(max_x, self.bounds[2]), min(max_y, self.bounds[3])
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                yield cell_x, cell_y
+
+    def insert_point(self, key, x, y):
+        if key in self.points:
+            self.remove_point(key)
+        cell = self.cell_of(x, y)
+        self.points[key] = (x, y)
+        self.point_cells.setdefault(cell, set()).add(key)
+        self._grow_bounds(cell)
+
+    def remove_point(self, key):
+        x, y = self.points.pop(key)
+        cell = self.cell_of(x, y)
+        bucket = self.point_cells[cell]
+        bucket.discard(key)
+        if not bucket:
+            del self.point_cells[cell]
+
+    def insert_edge(self, key, x1, y1, x2, y2):
+        if key in self.edges:
+            self.remove_edge(key)
+        bbox = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        self.edges[key] = bbox
+        for cell in self._cells_of_bbox(bbox):
+            self.edge_cells.setdefault(cell, set()).add(key)
+            self._grow_bounds(cell)
+
+    def remove_edge(self, key):
+        bbox = self.edges.pop(key)
+        for cell in self._cells_of_bbox(bbox):
+            bucket = self.edge_cells[cell]
+            bucket.discard(key)
+            if not bucket:
+                del self.edge_cells[cell]
+
+    def _cells_of_bbox(self, bbox):
+        min_x, min_y = self.cell_of(bbox[0], bbox[1])
+        max_x, max_y = self.cell_of(bbox[2], bbox[3])
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                yield cell_x, cell_y
+
+    def points_in_rect(self, x0, y0, x1, y1):
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        found = []
+        for cell in self.cells_in_rect(x0, y0, x1, y1):
+            for key in self.point_cells.get(cell, ()):
+                x, y = self.points[key]
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    found.append(key)
+        return found
+
+    def edges_in_rect(self, x0, y0, x1, y1):
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        found = set()
+        for cell in self.cells_in_rect(x0, y0, x1, y1):
+            for key in self.edge_cells.get(cell, ()):
+                bbox = self.edges[key]
+                if bbox[0] <= x1 and bbox[2] >= x0 and bbox[1] <= y1 and bbox[3] >= y0:
+                    found.add(key)
+        return found
+
+    def nearest_point(self, x, y, radius):
+        nearest, nearest_sq = None, radius * radius
+        for cell in self.cells_in_rect(x - radius, y - radius, x + radius, y + radius):
+            for key in self.point_cells.get(cell, ()):
+                px, py = self.points[key]
+                distance_sq = (px - x) ** 2 + (py - y) ** 2
+                if distance_sq <= nearest_sq:
+                    nearest, nearest_sq = key, distance_sq
+        return nearest
+
+
+def close_pairs(xs, ys, radius):
+    # Bucketing by the radius means a close pair always lies in the same or
+    # an adjacent cell; visiting half of the neighbourhood reports it once.
+    cells = {}
+    for index, (x, y) in enumerate(zip(xs, ys)):
+        cells.setdefault((math.floor(x / radius), math.floor(y / radius)), []).append(index)
+
+    radius_sq = radius * radius
+    pairs = []
+    for (cell_x, cell_y), members in cells.items():
+        for dx, dy in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):
+            others = cells.get((cell_x + dx, cell_y + dy))
+            if others is None:
+                continue
+            same_cell = dx == 0 and dy == 0
+            for a in members:
+                for b in others:
+                    if same_cell and b <= a:
+                        continue
+                    if (xs[a] - xs[b]) ** 2 + (ys[a] - ys[b]) ** 2 < radius_sq:
+                        pairs.append((a, b) if a < b else (b, a))
+    return pairs
+
+
+def group_pairs(count, pairs, priority=None):
+    # Every group is a centre and the points paired with it, so no member
+    # lies further than the pair radius from the centre; grouping whole
+    # chains of pairs would collapse a densely traced street onto one point.
+    # Centres are tried by descending priority, then by index.
+    partners = [[] for _ in range(count)]
+    for a, b in pairs:
+        partners[a].append(b)
+        partners[b].append(a)
+
+    order = range(count) if priority is None else sorted(range(count), key=lambda index: (-priority[index], index))
+    grouped = [False] * count
+    groups = []
+    for centre in order:
+        if grouped[centre]:
+            continue
+        members = [centre] + [index for index in partners[centre] if not grouped[index]]
+        if len(members) > 1:
+            for index in members:
+                grouped[index] = True
+            groups.append(members)
+    return groups
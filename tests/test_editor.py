@@ -0,0 +1,78 @@
+import pytest
+
+QtWidgets = pytest.importorskip("PyQt6.QtWidgets")
+
+
+@pytest.fixture
+def editor(tmp_path, monkeypatch):
+    import editor as editor_module
+
+    monkeypatch.chdir(tmp_path)
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    window = editor_module.MapEditor(str(tmp_path / "map.json"))
+    yield window
+    window.journal.close()
+    del app
+
+
+def test_self_loop_is_refused_and_point_can_be_removed(editor):
+    a = editor.create_point(0.0, 0.0)
+    b = editor.create_point(50.0, 0.0)
+    editor.connect_points(a, a, False)
+    editor.connect_points(a, b, False)
+
+    assert (a, a, False) not in editor.connections
+    assert a.connected_points_normal == [b]
+
+    editor.remove_points([a])
+    assert editor.points == [b]
+    assert editor.connections == {}
+
+
+def test_solid_and_dashed_connection_between_same_points_is_one_edge(editor):
+    from journal import MapState
+
+    a = editor.create_point(0.0, 0.0)
+    b = editor.create_point(50.0, 0.0)
+    editor.connect_points(a, b, False)
+    editor.connect_points(b, a, True)
+
+    assert list(editor.connections) == [(a, b, False)]
+    assert a.connected_points_dashed == []
+
+    state = MapState([0.0, 50.0], [0.0, 0.0], {})
+    state.connect(0, 1, False)
+    state.connect(1, 0, True)
+    assert state.to_graph().edge_count == 1
+
+
+def test_snapping_click_near_a_point_selects_it(editor):
+    from PyQt6.QtCore import QPointF
+
+    a = editor.create_point(0.0, 0.0)
+    b = editor.create_point(50.0, 0.0)
+    editor.snap_to_points = True
+
+    editor.add_point(editor.mapFromScene(QPointF(2.0, 1.0)).toPointF())
+    assert editor.points == [a, b]
+    assert editor.selected_point[1] is a
+
+    editor.add_point(editor.mapFromScene(QPointF(49.0, 2.0)).toPointF())
+    assert editor.points == [a, b]
+    assert editor.selected_point is None
+    assert a.connected_points_normal == [b]
+
+
+def test_merge_keeps_a_densely_traced_street(editor):
+    street = [editor.create_point(i * 8.0, 0.0) for i in range(30)]
+    for a, b in zip(street, street[1:]):
+        editor.connect_points(a, b, False)
+    far = editor.create_point(500.0, 500.0)
+    duplicate = editor.create_point(81.0, 3.0)
+    editor.connect_points(duplicate, far, False)
+
+    editor.merge_overlapping_points()
+
+    assert editor.points == street + [far]
+    assert len(editor.connections) == 30
+    assert sum(far in point.connected_points_normal for point in street) == 1
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from graph import Graph
+import journal
+import map_format
+import map_loader
+
+
+class Crash(Exception):
+    pass
+
+
+def make_journal(tmp_path):
+    map_path = str(tmp_path / "map.smap")
+    map_format.save_map(Graph([0.0, 10.0], [0.0, 0.0], [0], [1]), map_path)
+    edits = journal.EditJournal(map_path)
+    edits.record_add(20.0, 0.0)
+    edits.record_connect(1, 2, False)
+    edits.flush()
+    return map_path, edits
+
+
+def save(edits, map_path):
+    graph = Graph([0.0, 10.0, 20.0], [0.0, 0.0, 0.0], [0, 1], [1, 2])
+    edits.save_snapshot(lambda path: map_format.save_map(graph, path))
+
+
+def reload(map_path):
+    return journal.EditJournal(map_path).replay(map_loader.load_map(map_path))
+
+
+def test_crash_after_swapping_the_map_does_not_replay_folded_entries(tmp_path, monkeypatch):
+    map_path, edits = make_journal(tmp_path)
+    remove = os.remove
+
+    def crash_on_journal(path):
+        if path.endswith(".journal"):
+            raise Crash()
+        remove(path)
+
+    monkeypatch.setattr(journal.os, "remove", crash_on_journal)
+    with pytest.raises(Crash):
+        save(edits, map_path)
+    monkeypatch.undo()
+
+    assert os.path.exists(map_path + ".journal")
+    graph = reload(map_path)
+    assert graph.node_count == 3 and graph.edge_count == 2
+    assert not os.path.exists(map_path + ".journal")
+    assert not os.path.exists(map_path + ".journal.commit")
+
+
+def test_crash_before_swapping_the_map_replays_the_journal(tmp_path, monkeypatch):
+    map_path, edits = make_journal(tmp_path)
+
+    def crash(source, target):
+        raise Crash()
+
+    monkeypatch.setattr(journal.os, "replace", crash)
+    with pytest.raises(Crash):
+        save(edits, map_path)
+    monkeypatch.undo()
+
+    graph = reload(map_path)
+    assert graph.node_count == 3 and graph.edge_count == 2
+    assert not os.path.exists(map_path + ".journal.commit")
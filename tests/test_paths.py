@@ -0,0 +1,95 @@
+import math
+import random
+
+import pytest
+
+from contraction import ContractedGraph
+from dynamic_paths import DynamicShortestPaths
+from graph import Graph
+from routing import Landmarks
+
+
+def random_graph(rng):
+    # Long shuffled chains, so there is plenty to contract, plus a few
+    # random edges between them, some dashed, some looping on one node.
+    count = rng.randrange(2, 60)
+    xs = [rng.uniform(0, 100) for _ in range(count)]
+    ys = [rng.uniform(0, 100) for _ in range(count)]
+    edge_start, edge_end, edge_dashed = [], [], []
+    order = list(range(count))
+    rng.shuffle(order)
+    for a, b in zip(order, order[1:]):
+        if rng.random() < 0.85:
+            edge_start.append(a)
+            edge_end.append(b)
+            edge_dashed.append(rng.random() < 0.2)
+    for _ in range(rng.randrange(6)):
+        edge_start.append(rng.randrange(count))
+        edge_end.append(rng.randrange(count))
+        edge_dashed.append(rng.random() < 0.5)
+    return Graph(xs, ys, edge_start, edge_end, edge_dashed)
+
+
+def check_path(graph, path, start, end, expected):
+    if expected == math.inf:
+        assert path == []
+        return
+    assert path[0] == start and path[-1] == end
+    assert graph.path_length(path) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_contracted_route_matches_dijkstra(seed):
+    rng = random.Random(seed)
+    graph = random_graph(rng)
+    contracted = ContractedGraph(graph)
+    for _ in range(10):
+        start, end = rng.randrange(graph.node_count), rng.randrange(graph.node_count)
+        distances, _ = graph.distances_from(start)
+        check_path(graph, contracted.route(start, end), start, end, distances[end])
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_landmark_search_matches_dijkstra(seed):
+    rng = random.Random(seed)
+    graph = random_graph(rng)
+    landmarks = Landmarks.build(graph, rng.randrange(1, 5))
+    for _ in range(10):
+        start, end = rng.randrange(graph.node_count), rng.randrange(graph.node_count)
+        distances, _ = graph.distances_from(start)
+        check_path(graph, landmarks.search(graph, start, end), start, end, distances[end])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_dynamic_paths_match_dijkstra_after_every_change(seed):
+    rng = random.Random(seed)
+    count = 40
+    xs = [rng.uniform(0, 100) for _ in range(count)]
+    ys = [rng.uniform(0, 100) for _ in range(count)]
+    edges = [(rng.randrange(count), rng.randrange(count)) for _ in range(60)]
+
+    def length(a, b):
+        return math.hypot(xs[a] - xs[b], ys[a] - ys[b])
+
+    def neighbours(node):
+        for a, b in edges:
+            if a == node:
+                yield b, length(a, b)
+            if b == node:
+                yield a, length(a, b)
+
+    tree = DynamicShortestPaths(0, neighbours)
+    for _ in range(200):
+        if edges and rng.random() < 0.5:
+            a, b = edges.pop(rng.randrange(len(edges)))
+            tree.edge_removed(a, b)
+        else:
+            a, b = rng.randrange(count), rng.randrange(count)
+            edges.append((a, b))
+            tree.edge_added(a, b, length(a, b))
+
+        graph = Graph(xs, ys, [a for a, _ in edges], [b for _, b in edges])
+        distances, _ = graph.distances_from(0)
+        for node in range(count):
+            assert tree.distance(node) == pytest.approx(distances[node])
+            check_path(graph, tree.path_to(node), 0, node, distances[node])
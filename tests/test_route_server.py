@@ -0,0 +1,54 @@
+import asyncio
+import math
+
+from graph import Graph
+import map_format
+from route_server import RoutingService
+
+
+def make_service(tmp_path):
+    graph = Graph([0.0, 10.0, 20.0], [0.0, 0.0, 0.0], [0, 1], [1, 2])
+    map_path = str(tmp_path / "map.smap")
+    map_format.save_map(graph, map_path)
+    return RoutingService(map_path)
+
+
+def test_non_finite_coordinates_are_rejected(tmp_path):
+    service = make_service(tmp_path)
+    answers = service.answer([{"op": "nearest", "x": math.inf, "y": 0}, {"op": "nearest", "x": 9, "y": 1}])
+    assert "error" in answers[0]
+    assert answers[1]["node"] == 1
+
+
+def test_failing_batch_does_not_stop_the_worker(tmp_path):
+    service = make_service(tmp_path)
+    original = service.answer
+
+    def answer(queries):
+        if queries[0].get("op") == "explode":
+            raise OverflowError("boom")
+        return original(queries)
+
+    service.answer = answer
+
+    async def run():
+        service.pending = asyncio.Queue()
+        worker = asyncio.create_task(service.batch_worker())
+        failed = await asyncio.wait_for(service.submit([{"op": "explode"}]), 5)
+        answered = await asyncio.wait_for(service.submit([{"op": "distance", "start": 0, "end": 2}]), 5)
+        worker.cancel()
+        return failed, answered
+
+    failed, answered = asyncio.run(run())
+    assert "error" in failed[0]
+    assert answered[0]["distance"] == 20.0
+
+
+def test_bad_node_ids_fail_only_their_own_query(tmp_path):
+    service = make_service(tmp_path)
+    queries = [{"op": "distance", "start": 0, "end": 2}, {"op": "distance", "start": 0, "end": 1e400},
+               {"op": "distance", "start": 0, "end": 1.9}, {"op": "distance", "start": True, "end": 2},
+               {"op": "nearest", "x": 10 ** 400, "y": 0}]
+    answers = service.answer(queries)
+    assert answers[0] == {"distance": 20.0}
+    assert all("error" in answer for answer in answers[1:])
@@ -0,0 +1,9 @@
+import pytest
+
+from scheduler import EventFleet
+
+
+@pytest.mark.parametrize("spacing", [0.0, -5.0, float("nan")])
+def test_vehicle_spacing_must_be_positive(spacing):
+    with pytest.raises(ValueError):
+        EventFleet([0.0, 10.0], [0.0, 0.0], spacing)
@@ -0,0 +1,195 @@
+import json
+import math
+import os
+import sys
+from collections import OrderedDict
+
+TILE_SIZE = 256
+METADATA_NAME = "pyramid.json"
+
+
+def pyramid_directory(image_path):
+    return os.path.splitext(image_path)[0] + "_tiles"
+
+
+class TilePyramid:
+    # Level 0 holds the image at full resolution, every next level halves it
+    # until it fits one tile. The image is centred on the map origin, the way
+    # the editor has always placed the background.
+    def __init__(self, directory, width, height, tile_size=TILE_SIZE, levels=1, extension="png"):
+        self.directory = directory
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.levels = levels
+        self.extension = extension
+        self.left = -width / 2
+        self.top = -height / 2
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, METADATA_NAME)) as metadata_file:
+            metadata = json.load(metadata_file)
+        return cls(directory, metadata["width"], metadata["height"], metadata["tile_size"], metadata["levels"],
+                   metadata["extension"])
+
+    @classmethod
+    def for_image(cls, image_path):
+        directory = pyramid_directory(image_path)
+        if not os.path.exists(os.path.join(directory, METADATA_NAME)):
+            return None
+        return cls.load(directory)
+
+    def save(self):
+        metadata = {"width": self.width, "height": self.height, "tile_size": self.tile_size,
+                    "levels": self.levels, "extension": self.extension}
+        with open(os.path.join(self.directory, METADATA_NAME), "w") as metadata_file:
+            json.dump(metadata, metadata_file, indent=4)
+
+    def tile_path(self, level, col, row):
+        return os.path.join(self.directory, str(level), f"{col}_{row}.{self.extension}")
+
+    def level_size(self, level):
+        return -(-self.width // 2 ** level), -(-self.height // 2 ** level)
+
+    def level_for(self, scale):
+        # The coarsest level that still has at least one image pixel per
+        # screen pixel at the given screen pixels per map unit.
+        if scale <= 0:
+            return self.levels - 1
+        level = math.floor(math.log2(1 / scale)) if scale < 1 else 0
+        return min(max(level, 0), self.levels - 1)
+
+    def tile_rect(self, level, col, row):
+        width, height = self.level_size(level)
+        factor = 2 ** level
+        tile_width = min(self.tile_size, width - col * self.tile_size)
+        tile_height = min(self.tile_size, height - row * self.tile_size)
+        return (self.left + col * self.tile_size * factor, self.top + row * self.tile_size * factor,
+                tile_width * factor, tile_height * factor)
+
+    def tiles_in_rect(self, level, left, top, right, bottom):
+        width, height = self.level_size(level)
+        span = self.tile_size * 2 ** level
+        cols = -(-width // self.tile_size)
+        rows = -(-height // self.tile_size)
+        first_col = max(int(math.floor((left - self.left) / span)), 0)
+        last_col = min(int(math.floor((right - self.left) / span)), cols - 1)
+        first_row = max(int(math.floor((top - self.top) / span)), 0)
+        last_row = min(int(math.floor((bottom - self.top) / span)), rows - 1)
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                yield level, col, row
+
+
+class TileCache:
+    # Least recently used tiles are dropped once more than capacity are held;
+    # loader turns a (level, col, row) key into whatever the caller draws.
+    def __init__(self, loader, capacity=256):
+        self.loader = loader
+        self.capacity = capacity
+        self.tiles = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self.tiles:
+            self.hits += 1
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+        self.misses += 1
+        tile = self.loader(key)
+        self.tiles[key] = tile
+        if len(self.tiles) > self.capacity:
+            self.tiles.popitem(last=False)
+        return tile
+
+    def clear(self):
+        self.tiles.clear()
+
+
+def _read_strips(image_path, tile_size):
+    # Formats that can decode a clipped region are read one row of tiles at a
+    # time, anything else has to be decoded whole once.
+    from PyQt6.QtCore import QRect
+    from PyQt6.QtGui import QImageIOHandler, QImageReader
+
+    reader = QImageReader(image_path)
+    size = reader.size()
+    if reader.supportsOption(QImageIOHandler.ImageOption.ClipRect):
+        for top in range(0, size.height(), tile_size):
+            strip_reader = QImageReader(image_path)
+            strip_reader.setAllocationLimit(0)
+            strip_reader.setClipRect(QRect(0, top, size.width(), min(tile_size, size.height() - top)))
+            yield top, strip_reader.read()
+        return
+
+    reader.setAllocationLimit(0)
+    image = reader.read()
+    if image.isNull():
+        return
+    for top in range(0, image.height(), tile_size):
+        yield top, image.copy(0, top, image.width(), min(tile_size, image.height() - top))
+
+
+def build_pyramid(image_path, directory=None, tile_size=TILE_SIZE, extension="png"):
+    from PyQt6.QtCore import Qt
+    from PyQt6.QtGui import QImage, QImageReader, QPainter
+
+    size = QImageReader(image_path).size()
+    if not size.isValid():
+        print(f"Could not read image {image_path}")
+        return None
+
+    levels = 1
+    while max(size.width(), size.height()) > tile_size * 2 ** (levels - 1):
+        levels += 1
+    pyramid = TilePyramid(directory or pyramid_directory(image_path), size.width(), size.height(), tile_size,
+                          levels, extension)
+    os.makedirs(os.path.join(pyramid.directory, "0"), exist_ok=True)
+
+    for top, strip in _read_strips(image_path, tile_size):
+        if strip.isNull():
+            print(f"Could not read image {image_path}")
+            return None
+        row = top // tile_size
+        for left in range(0, strip.width(), tile_size):
+            strip.copy(left, 0, min(tile_size, strip.width() - left), strip.height()).save(
+                pyramid.tile_path(0, left // tile_size, row))
+
+    # Every tile of a coarser level is the 2x2 block of tiles below it shrunk
+    # to half, so only one level 0 strip is ever held in memory.
+    for level in range(1, levels):
+        os.makedirs(os.path.join(pyramid.directory, str(level)), exist_ok=True)
+        width, height = pyramid.level_size(level - 1)
+        for row in range(-(-height // (2 * tile_size))):
+            for col in range(-(-width // (2 * tile_size))):
+                block = QImage(min(2 * tile_size, width - 2 * col * tile_size),
+                               min(2 * tile_size, height - 2 * row * tile_size), QImage.Format.Format_ARGB32)
+                block.fill(Qt.GlobalColor.transparent)
+                painter = QPainter(block)
+                for dy in (0, 1):
+                    for dx in (0, 1):
+                        path = pyramid.tile_path(level - 1, 2 * col + dx, 2 * row + dy)
+                        if os.path.exists(path):
+                            painter.drawImage(dx * tile_size, dy * tile_size, QImage(path))
+                painter.end()
+                block.scaled(-(-block.width() // 2), -(-block.height() // 2),
+                             Qt.AspectRatioMode.IgnoreAspectRatio,
+                             Qt.TransformationMode.SmoothTransformation).save(pyramid.tile_path(level, col, row))
+
+    pyramid.save()
+    return pyramid
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--") and "=" in arg)
+    if not args:
+        print("Usage: python tiles.py <image> [output_directory] [--tile-size=N] [--format=png|jpg]")
+        sys.exit(1)
+
+    pyramid = build_pyramid(args[0], args[1] if len(args) > 1 else None, int(options.get("tile-size", TILE_SIZE)),
+                            options.get("format", "png"))
+    if pyramid is not None:
+        print(f"Cut {pyramid.width}x{pyramid.height} image into {pyramid.levels} levels in {pyramid.directory}")